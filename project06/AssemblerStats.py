@@ -0,0 +1,122 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import contextlib
+import json
+import time
+import tracemalloc
+import typing
+from Parser import Command
+from SymbolTable import SymbolTable
+
+
+class AssemblerStats:
+    """Timings and counters of assembling a single file: the wall and CPU
+    time of every phase, the number of A, C and L commands, the number of
+    labels and variables in the symbol table, and the peak memory use as
+    traced by tracemalloc. Tracing memory slows Python down, so the phase
+    times are only comparable with those of other --stats runs.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): the path of the assembled file.
+        """
+        self.path = path
+        # Phase name -> (wall seconds, CPU seconds), in the order they ran
+        self.phases = {}
+        self.commands = {"A": 0, "C": 0, "L": 0}
+        self.symbols = {"labels": 0, "variables": 0}
+        self.peak_memory = 0
+        # The (wall, CPU) seconds of the phases nested in every running phase
+        self.nested = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Times the code run inside the with-block as the given phase. A
+        phase that runs more than once accumulates its times. The time of a
+        phase that runs inside another one is not counted in the outer
+        phase, so the phases still add up to the total."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        self.nested.append([0.0, 0.0])
+        try:
+            yield
+        finally:
+            nested_wall, nested_cpu = self.nested.pop()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            if self.nested:
+                self.nested[-1][0] += wall
+                self.nested[-1][1] += cpu
+            total_wall, total_cpu = self.phases.get(name, (0.0, 0.0))
+            self.phases[name] = (
+                total_wall + wall - nested_wall, total_cpu + cpu - nested_cpu)
+
+    @contextlib.contextmanager
+    def trace_memory(self) -> typing.Iterator[None]:
+        """Records the peak memory allocated inside the with-block."""
+        already_tracing = tracemalloc.is_tracing()
+        if already_tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if not already_tracing:
+                tracemalloc.stop()
+
+    def count_commands(self, commands: typing.Iterable[Command]) -> None:
+        for command in commands:
+            self.commands[command.kind[0]] += 1
+
+    def count_symbols(self, table: SymbolTable) -> None:
+        for kind in table.kinds.values():
+            self.symbols[kind + "s"] += 1
+
+    def to_dict(self) -> dict:
+        wall = sum(wall for wall, _ in self.phases.values())
+        cpu = sum(cpu for _, cpu in self.phases.values())
+        return {
+            "path": self.path,
+            "phases": {
+                name: {"wall": wall, "cpu": cpu}
+                for name, (wall, cpu) in self.phases.items()},
+            "total": {"wall": wall, "cpu": cpu},
+            "commands": self.commands,
+            "symbols": self.symbols,
+            "peak_memory": self.peak_memory,
+        }
+
+    def write(self, output_file: typing.TextIO, output_format: str) -> None:
+        """Writes the report.
+
+        Args:
+            output_file (typing.TextIO): writes the report to this file.
+            output_format (str): "json" for a single line of JSON, "text" for
+                a table meant for humans.
+        """
+        report = self.to_dict()
+        if output_format == "json":
+            output_file.write(json.dumps(report) + "\n")
+            return
+        output_file.write(self.path + "\n")
+        output_file.write("  {:<12}{:>12}{:>12}\n".format(
+            "phase", "wall (ms)", "cpu (ms)"))
+        rows = list(report["phases"].items()) + [("total", report["total"])]
+        for name, times in rows:
+            output_file.write("  {:<12}{:>12.3f}{:>12.3f}\n".format(
+                name, times["wall"] * 1000, times["cpu"] * 1000))
+        output_file.write(
+            "  commands: {A} A, {C} C, {L} L\n".format(**self.commands))
+        output_file.write(
+            "  symbols: {labels} labels, {variables} variables\n".format(
+                **self.symbols))
+        output_file.write(
+            "  peak memory: {} bytes\n".format(self.peak_memory))
@@ -0,0 +1,139 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import contextlib
+import hashlib
+import os
+import tempfile
+import typing
+from HackImage import load_image, write_image
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join("~", ".cache")),
+    "hack-assembler")
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class AssemblyCache:
+    """An on-disk cache of assembled programs.
+    Every entry is a packed ROM image (see HackImage) named after a hash of
+    the assembler version and of the source it was assembled from, so an
+    entry can never be stale. Once the cache grows beyond its maximal size,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, version: str, directory: str = DEFAULT_CACHE_DIR,
+                 max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """Opens the cache directory, creating it if needed.
+
+        Args:
+            version (str): the assembler version, part of every key.
+            directory (str): the cache directory.
+            max_size (int): the maximal total size of the entries, in bytes.
+        """
+        self.version = version
+        self.directory = os.path.expanduser(directory)
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def digest(self) -> typing.Any:
+        """
+        Returns:
+            typing.Any: a sha256 hash to update with the contents of an .asm file,
+            whose hexdigest is then the key of its cache entry. This way, the
+            key can be computed from the very bytes that were assembled.
+        """
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(b"\0")
+        return digest
+
+    def key(self, source_file: typing.BinaryIO) -> str:
+        """Hashes the source in chunks, so it is never read into memory as a
+        whole.
+
+        Args:
+            source_file (typing.BinaryIO): an .asm file opened for reading in
+                binary mode, from its start.
+
+        Returns:
+            str: the key of the cache entry of the given source.
+        """
+        digest = self.digest()
+        for chunk in iter(lambda: source_file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> typing.Optional[array.array]:
+        """
+        Args:
+            key (str): the key of an .asm file, see key.
+
+        Returns:
+            array.array: the machine words assembled from the given source, or
+            None if they are not cached.
+        """
+        path = os.path.join(self.directory, key + ".bin")
+        try:
+            words = array.array("H", load_image(path))
+        except (OSError, ValueError):
+            return None
+        # Mark the entry as recently used, for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return words
+
+    def put(self, key: str, words: array.array) -> None:
+        """Stores the machine words assembled from the given source.
+
+        Args:
+            key (str): the key of the .asm file, see key.
+            words (array.array): the machine words, as an array of type "H".
+        """
+        path = os.path.join(self.directory, key + ".bin")
+        # Write to a temporary file first, so concurrent assemblers never see
+        # a partial entry
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                write_image(words, temp_file)
+            os.replace(temp_path, path)
+        except OSError:
+            # e.g. a full disk, do not leave the partial entry behind
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in
+        its maximal size."""
+        entries = []
+        total_size = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Already evicted by another assembler process
+                pass
+            total_size -= size
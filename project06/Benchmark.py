@@ -0,0 +1,195 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import typing
+from Code import DEST_DICT, COMP_DICT, SHIFT_COMP_DICT, JUMP_DICT
+from Main import ASSEMBLER_VERSION, assemble_file
+
+# The ROM holds 32K instructions
+ROM_SIZE = 32768
+
+# Workload name -> (instructions, labels, variables, ratio of A-commands).
+# Every A-command refers to a label, a variable or a number, at random.
+WORKLOADS = {
+    "labels": (24000, 8000, 16, 0.5),
+    "variables": (24000, 16, 8000, 0.5),
+    "c-flood": (30000, 0, 0, 0.0),
+    "rom-full": (ROM_SIZE - 1, 2000, 1000, 0.4),
+}
+
+
+def generate_program(
+        rng: random.Random, instructions: int, labels: int, variables: int,
+        a_ratio: float) -> str:
+    """Generates a random program with the given mix of commands. The lines
+    come with the indentation, blank lines and comments of hand-written code,
+    so that cleaning the input costs what it usually does.
+
+    Args:
+        rng (random.Random): the source of randomness.
+        instructions (int): the number of A and C commands.
+        labels (int): the number of labels, spread evenly over the program.
+        variables (int): the number of distinct variables.
+        a_ratio (float): the ratio of A-commands among the instructions.
+
+    Returns:
+        str: the program.
+    """
+    dests = list(DEST_DICT)
+    comps = list(COMP_DICT) + list(SHIFT_COMP_DICT)
+    jumps = list(JUMP_DICT)
+    label_names = ["LOOP_{}".format(i) for i in range(labels)]
+    variable_names = ["var{}".format(i) for i in range(variables)]
+    label_every = instructions // labels if labels else instructions + 1
+    lines = []
+    for i in range(instructions):
+        if i % label_every == 0 and i // label_every < labels:
+            lines.append("({})".format(label_names[i // label_every]))
+        if rng.random() < a_ratio:
+            kind = rng.random()
+            if label_names and kind < 0.4:
+                line = "@" + rng.choice(label_names)
+            elif variable_names and kind < 0.8:
+                line = "@" + rng.choice(variable_names)
+            else:
+                line = "@{}".format(rng.randrange(ROM_SIZE))
+        else:
+            dest, jump = rng.choice(dests), rng.choice(jumps)
+            line = rng.choice(comps)
+            if dest:
+                line = dest + "=" + line
+            if jump:
+                line = line + ";" + jump
+        if rng.random() < 0.1:
+            line += "    // " + "comment " * rng.randrange(1, 4)
+        lines.append("    " + line)
+        if rng.random() < 0.02:
+            lines.append("")
+    return "\n".join(lines) + "\n"
+
+def time_workload(source: str, repeat: int) -> list[float]:
+    """
+    Returns:
+        list[float]: the wall time, in seconds, of each of repeat runs of
+        assemble_file over the source. Both files are in memory, so only the
+        assembler itself is timed.
+    """
+    times = []
+    for _ in range(repeat):
+        input_file = io.StringIO(source)
+        output_file = io.StringIO()
+        start = time.perf_counter()
+        assemble_file(input_file, output_file)
+        times.append(time.perf_counter() - start)
+    return times
+
+def run_benchmarks(
+        workloads: list[str], repeat: int, seed: int,
+        scale: float = 1.0) -> dict:
+    """Generates every workload and times the assembler over it.
+
+    Args:
+        workloads (list[str]): names of WORKLOADS to run.
+        repeat (int): the number of runs of every workload.
+        seed (int): seeds the program generator, so that runs with the same
+            seed assemble the same programs.
+        scale (float): scales the size of every workload.
+
+    Returns:
+        dict: the results, ready to be written as JSON.
+    """
+    results = {}
+    for name in workloads:
+        instructions, labels, variables, a_ratio = WORKLOADS[name]
+        instructions = max(1, int(instructions * scale))
+        labels = min(labels, instructions)
+        source = generate_program(
+            random.Random(seed), instructions, labels, variables, a_ratio)
+        times = time_workload(source, repeat)
+        best = min(times)
+        results[name] = {
+            "instructions": instructions,
+            "labels": labels,
+            "variables": variables,
+            "lines": source.count("\n"),
+            "bytes": len(source),
+            "times": times,
+            "min": best,
+            "median": statistics.median(times),
+            "instructions_per_second": instructions / best,
+        }
+    return {
+        "assembler_version": ASSEMBLER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "scale": scale,
+        "workloads": results,
+    }
+
+def write_summary(
+        results: dict, baseline: dict, output_file: typing.TextIO) -> None:
+    """Writes the best time of every workload, along with the speedup over
+    the baseline results when the baseline has the same workload."""
+    for name, result in results["workloads"].items():
+        line = "{:<12}{:>8} instructions{:>10.1f} ms{:>12.0f} instr/s".format(
+            name, result["instructions"], result["min"] * 1000,
+            result["instructions_per_second"])
+        old = (baseline or {}).get("workloads", {}).get(name)
+        if old and old["instructions"] == result["instructions"]:
+            line += "{:>8.2f}x".format(old["min"] / result["min"])
+        output_file.write(line + "\n")
+
+
+if "__main__" == __name__:
+    # Runs the benchmarks and writes the results as JSON.
+    arg_parser = argparse.ArgumentParser(
+        prog="Benchmark",
+        description="Times the assembler over generated programs.")
+    arg_parser.add_argument(
+        "workloads", nargs="*", default=list(WORKLOADS),
+        help="workloads to run, out of: " + ", ".join(WORKLOADS))
+    arg_parser.add_argument(
+        "-o", "--output", help="write the results to this JSON file")
+    arg_parser.add_argument(
+        "--compare", metavar="BASELINE",
+        help="a JSON file of earlier results, to report the speedup over")
+    arg_parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="runs of every workload, the best one counts (default: 5)")
+    arg_parser.add_argument(
+        "--seed", type=int, default=0,
+        help="seeds the generated programs (default: 0)")
+    arg_parser.add_argument(
+        "--scale", type=float, default=1.0,
+        help="scales the size of every workload (default: 1)")
+    args = arg_parser.parse_args()
+    unknown = [name for name in args.workloads if name not in WORKLOADS]
+    if unknown:
+        arg_parser.error("unknown workloads: " + ", ".join(unknown))
+    if args.repeat < 1 or not 0 < args.scale * WORKLOADS["rom-full"][0] \
+            < ROM_SIZE:
+        arg_parser.error("--repeat must be positive and --scale must keep "
+                         "the programs within the ROM")
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+    results = run_benchmarks(args.workloads, args.repeat, args.seed, args.scale)
+    write_summary(results, baseline, sys.stdout)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
@@ -5,6 +5,99 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+DEST_DICT = {
+    "": "000",
+    "M": "001",
+    "D": "010",
+    "DM": "011",
+    "MD": "011",
+    "A": "100",
+    "AM": "101",
+    "AD": "110",
+    "ADM": "111",
+}
+
+COMP_DICT = {
+    "0": "0101010",
+    "1": "0111111",
+    "-1": "0111010",
+    "D": "0001100",
+    "A": "0110000",
+    "!D": "0001101",
+    "!A": "0110001",
+    "-D": "0001111",
+    "-A": "0110011",
+    "D+1": "0011111",
+    "A+1": "0110111",
+    "D-1": "0001110",
+    "A-1": "0110010",
+    "D+A": "0000010",
+    "D-A": "0010011",
+    "A-D": "0000111",
+    "D&A": "0000000",
+    "D|A": "0010101",
+    "M": "1110000",
+    "!M": "1110001",
+    "-M": "1110011",
+    "M+1": "1110111",
+    "M-1": "1110010",
+    "D+M": "1000010",
+    "D-M": "1010011",
+    "M-D": "1000111",
+    "D&M": "1000000",
+    "D|M": "1010101",
+    # The same computations, with their operands written the other way around
+    "A+D": "0000010",
+    "A&D": "0000000",
+    "A|D": "0010101",
+    "M+D": "1000010",
+    "M&D": "1000000",
+    "M|D": "1010101",
+}
+
+# Shift computations of the extended CPU (CpuMul), encoded with a "101" prefix
+SHIFT_COMP_DICT = {
+    "D>>": "0010000",
+    "A>>": "0000000",
+    "M>>": "1000000",
+    "D<<": "0110000",
+    "A<<": "0100000",
+    "M<<": "1100000",
+}
+
+JUMP_DICT = {
+    "": "000",
+    "JGT": "001",
+    "JEQ": "010",
+    "JGE": "011",
+    "JLT": "100",
+    "JNE": "101",
+    "JLE": "110",
+    "JMP": "111",
+}
+
+
+def build_c_command_table() -> dict:
+    """Builds a table from every valid "dest=comp;jump" command, written the
+    way the Parser cleans it, to its full 16-bit instruction word.
+    """
+    table = {}
+    for comp_dict, prefix in ((COMP_DICT, "111"), (SHIFT_COMP_DICT, "101")):
+        for comp, comp_bits in comp_dict.items():
+            for dest, dest_bits in DEST_DICT.items():
+                for jump, jump_bits in JUMP_DICT.items():
+                    command = comp
+                    if dest:
+                        command = dest + "=" + command
+                    if jump:
+                        command = command + ";" + jump
+                    table[command] = int(
+                        prefix + comp_bits + dest_bits + jump_bits, 2)
+    return table
+
+C_COMMAND_TABLE = build_c_command_table()
+
+
 class Code:
     """Translates Hack assembly language mnemonics into binary codes."""
     
@@ -17,17 +110,6 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        DEST_DICT = {
-            "": "000",
-            "M": "001",
-            "D": "010",
-            "DM": "011",
-            "MD": "011",
-            "A": "100",
-            "AM": "101",
-            "AD": "110",
-            "ADM": "111",
-        }
         if mnemonic in DEST_DICT:
             return DEST_DICT[mnemonic]
 
@@ -40,44 +122,10 @@ class Code:
         Returns:
             str: the binary code of the given mnemonic.
         """
-        COMP_DICT = {
-            "0": "0101010",
-            "1": "0111111",
-            "-1": "0111010",
-            "D": "0001100",
-            "A": "0110000",
-            "!D": "0001101",
-            "!A": "0110001",
-            "-D": "0001111",
-            "-A": "0110011",
-            "D+1": "0011111",
-            "A+1": "0110111",
-            "D-1": "0001110",
-            "A-1": "0110010",
-            "D+A": "0000010",
-            "D-A": "0010011",
-            "A-D": "0000111",
-            "D&A": "0000000",
-            "D|A": "0010101",
-            "M": "1110000",
-            "!M": "1110001",
-            "-M": "1110011",
-            "M+1": "1110111",
-            "M-1": "1110010",
-            "D+M": "1000010",
-            "D-M": "1010011",
-            "M-D": "1000111",
-            "D&M": "1000000",
-            "D|M": "1010101",
-            "D>>": "0010000",
-            "A>>": "0000000",
-            "M>>": "1000000",
-            "D<<": "0110000",
-            "A<<": "0100000",
-            "M<<": "1100000",
-        }
         if mnemonic in COMP_DICT:
             return COMP_DICT[mnemonic]
+        if mnemonic in SHIFT_COMP_DICT:
+            return SHIFT_COMP_DICT[mnemonic]
 
     @staticmethod
     def jump(mnemonic: str) -> str:
@@ -88,15 +136,18 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        JUMP_DICT = {
-            "": "000",
-            "JGT": "001",
-            "JEQ": "010",
-            "JGE": "011",
-            "JLT": "100",
-            "JNE": "101",
-            "JLE": "110",
-            "JMP": "111",
-        }
         if mnemonic in JUMP_DICT:
-            return JUMP_DICT[mnemonic]
\ No newline at end of file
+            return JUMP_DICT[mnemonic]
+
+    @staticmethod
+    def c_command(command: str) -> int:
+        """
+        Args:
+            command (str): a whole "dest=comp;jump" command, without
+            whitespace.
+
+        Returns:
+            int: the 16-bit instruction word of the given command, or None if
+            it is not a valid C-command.
+        """
+        return C_COMMAND_TABLE.get(command)
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import sys
+import typing
+from Code import DEST_DICT, COMP_DICT, SHIFT_COMP_DICT, JUMP_DICT
+from HackImage import IMAGE_MAGIC, load_image
+from Main import assemble
+
+# The first C-instruction word, any smaller word is "@word"
+MIN_C_WORD = 1 << 15
+
+
+def reverse_mnemonics(
+        mnemonics: dict[str, str], prefer_last: bool = False) -> dict[str, str]:
+    """Reverses one of Code's dicts. Where several mnemonics share a code,
+    the first one is kept, or the last one if prefer_last is set."""
+    items = mnemonics.items() if prefer_last else reversed(mnemonics.items())
+    return {bits: mnemonic for mnemonic, bits in items}
+
+def build_disassembly_table() -> dict[int, str]:
+    """Builds a table from every valid C-instruction word to its canonical
+    "dest=comp;jump" command, the reverse of Code.C_COMMAND_TABLE.
+    Computations written both ways (e.g. "D+A" and "A+D") get the first way,
+    and dests get the last one (e.g. "MD" rather than "DM"), which is the
+    way the book writes them.
+    """
+    dests = reverse_mnemonics(DEST_DICT, prefer_last=True)
+    jumps = reverse_mnemonics(JUMP_DICT)
+    table = {}
+    for comp_dict, prefix in ((COMP_DICT, "111"), (SHIFT_COMP_DICT, "101")):
+        for comp_bits, comp in reverse_mnemonics(comp_dict).items():
+            for dest_bits, dest in dests.items():
+                for jump_bits, jump in jumps.items():
+                    command = comp
+                    if dest:
+                        command = dest + "=" + command
+                    if jump:
+                        command = command + ";" + jump
+                    table[int(prefix + comp_bits + dest_bits + jump_bits,
+                              2)] = command
+    return table
+
+DISASSEMBLY_TABLE = build_disassembly_table()
+
+
+def disassemble_word(word: int) -> str:
+    """
+    Args:
+        word (int): a 16-bit instruction word.
+
+    Returns:
+        str: its canonical assembly command, or None if the word is not a
+        valid instruction.
+    """
+    if word < MIN_C_WORD:
+        return "@" + str(word)
+    return DISASSEMBLY_TABLE.get(word)
+
+def disassemble(words: typing.Sequence[int]) -> list[str]:
+    """Disassembles machine words into canonical assembly, one command per
+    word. Labels and variable names are not part of the machine code, so
+    every A-command is numeric.
+
+    Args:
+        words (typing.Sequence[int]): the 16-bit instruction words.
+
+    Returns:
+        list[str]: the commands.
+    """
+    table = DISASSEMBLY_TABLE
+    commands = []
+    for address, word in enumerate(words):
+        if word < MIN_C_WORD:
+            commands.append("@" + str(word))
+        elif word in table:
+            commands.append(table[word])
+        else:
+            raise ValueError("Not a valid instruction at address {}: {}".format(
+                address, format(word, 'b').zfill(16)))
+    return commands
+
+def compare_words(
+        expected: typing.Sequence[int],
+        actual: typing.Sequence[int]) -> list[tuple[int, int, int]]:
+    """Compares two programs word by word.
+
+    Returns:
+        list[tuple[int, int, int]]: the (address, expected word, actual word)
+        of every address at which the programs differ. An address that only
+        one of the programs reaches has None as the word of the other one.
+    """
+    differences = [
+        (address, expected_word, actual_word)
+        for address, (expected_word, actual_word)
+        in enumerate(zip(expected, actual))
+        if expected_word != actual_word]
+    for address in range(min(len(expected), len(actual)),
+                         max(len(expected), len(actual))):
+        differences.append((
+            address,
+            expected[address] if address < len(expected) else None,
+            actual[address] if address < len(actual) else None))
+    return differences
+
+def verify(words: typing.Sequence[int]) -> list[tuple[int, int, int]]:
+    """Disassembles machine words, reassembles the result and compares the
+    two programs word by word, see compare_words.
+
+    Returns:
+        list[tuple[int, int, int]]: the differences, empty if the round trip
+        gave back the same program.
+    """
+    reassembled, _ = assemble(disassemble(words))
+    return compare_words(words, reassembled)
+
+def read_words(path: str) -> typing.Sequence[int]:
+    """Reads the machine words of a textual .hack file, or of a packed ROM
+    image (see HackImage), which is told apart by its magic bytes.
+
+    Args:
+        path (str): the path of the program.
+
+    Returns:
+        typing.Sequence[int]: the 16-bit instruction words.
+    """
+    with open(path, 'rb') as program_file:
+        magic = program_file.read(len(IMAGE_MAGIC))
+    if magic == IMAGE_MAGIC:
+        return load_image(path)
+    words = []
+    with open(path, 'r') as program_file:
+        for line_number, line in enumerate(program_file, 1):
+            line = line.strip()
+            if line == "":
+                continue
+            if len(line) != 16 or line.strip("01") != "":
+                raise ValueError("Not a 16-bit binary word at line {}: {}"
+                                 .format(line_number, line))
+            words.append(int(line, 2))
+    return words
+
+def describe_word(word: typing.Optional[int]) -> str:
+    if word is None:
+        return "(missing)"
+    command = disassemble_word(word)
+    return "{} {}".format(
+        format(word, 'b').zfill(16), command if command else "(invalid)")
+
+
+if "__main__" == __name__:
+    # Disassembles the program given as argument, or verifies that it
+    # survives a round trip through the disassembler and the assembler.
+    arg_parser = argparse.ArgumentParser(
+        prog="Disassembler",
+        description="Disassembles .hack files and packed .bin images.")
+    arg_parser.add_argument("path", help="a .hack file or a .bin image")
+    arg_parser.add_argument(
+        "-o", "--output",
+        help="the .asm file to write (default: standard output)")
+    arg_parser.add_argument(
+        "--verify", action="store_true",
+        help="reassemble the disassembly and compare it word by word with "
+             "the program, instead of writing it")
+    arg_parser.add_argument(
+        "--compare", metavar="OTHER",
+        help="compare the program word by word with another .hack file or "
+             ".bin image, instead of writing it")
+    args = arg_parser.parse_args()
+    try:
+        words = read_words(args.path)
+        if args.verify:
+            differences = verify(words)
+        elif args.compare:
+            differences = compare_words(words, read_words(args.compare))
+        else:
+            commands = disassemble(words)
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+    if args.verify or args.compare:
+        for address, expected_word, actual_word in differences:
+            print("{}: {} != {}".format(
+                address, describe_word(expected_word),
+                describe_word(actual_word)))
+        if differences:
+            sys.exit("{} of {} words differ".format(
+                len(differences), len(words)))
+    elif args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.writelines(command + "\n" for command in commands)
+    else:
+        sys.stdout.writelines(command + "\n" for command in commands)
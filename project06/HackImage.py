@@ -0,0 +1,63 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import mmap
+import struct
+import sys
+import typing
+
+# A packed ROM image starts with this header: the magic bytes, the format
+# version, a reserved field and the number of words that follow it. The words
+# themselves are stored as little-endian unsigned 16-bit integers.
+IMAGE_MAGIC = b"HACK"
+IMAGE_VERSION = 1
+IMAGE_HEADER = struct.Struct("<4sHHI")
+
+
+def write_image(words: array.array, output_file: typing.BinaryIO) -> None:
+    """Writes machine words as a packed binary ROM image.
+
+    Args:
+        words (array.array): the machine words, as an array of type "H".
+        output_file (typing.BinaryIO): a file opened in binary mode.
+    """
+    output_file.write(
+        IMAGE_HEADER.pack(IMAGE_MAGIC, IMAGE_VERSION, 0, len(words)))
+    if sys.byteorder == "big":
+        words = array.array("H", words)
+        words.byteswap()
+    output_file.write(words.tobytes())
+
+
+def load_image(path: str) -> typing.Sequence[int]:
+    """Maps a packed binary ROM image into memory.
+
+    Args:
+        path (str): the path of the image.
+
+    Returns:
+        typing.Sequence[int]: the machine words of the image. On little-endian
+        machines this is a read-only view straight into the mapped file, so
+        words are only read from disk when they are accessed.
+    """
+    with open(path, 'rb') as image_file:
+        mapped = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < IMAGE_HEADER.size:
+        raise ValueError("Not a Hack ROM image: " + path)
+    magic, version, _, count = IMAGE_HEADER.unpack_from(mapped)
+    if magic != IMAGE_MAGIC or version != IMAGE_VERSION:
+        raise ValueError("Not a Hack ROM image: " + path)
+    end = IMAGE_HEADER.size + 2 * count
+    if len(mapped) < end:
+        raise ValueError("Truncated Hack ROM image: " + path)
+    if sys.byteorder == "big":
+        words = array.array("H", mapped[IMAGE_HEADER.size:end])
+        words.byteswap()
+        mapped.close()
+        return words
+    return memoryview(mapped)[IMAGE_HEADER.size:end].cast("H")
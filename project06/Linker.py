@@ -0,0 +1,86 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import array
+import os
+import sys
+from SymbolTable import SymbolTable
+from ObjectModule import ObjectModule
+from Main import render_words, write_if_changed
+
+
+def link(modules: list[ObjectModule]) -> tuple[array.array, SymbolTable]:
+    """Links object modules into one program.
+    The modules are placed one after the other, in the given order, so the
+    first module starts at ROM address 0. Symbols that no module defines as
+    a label are allocated as variables in order of first use, so linking the
+    modules of several files gives the same program as assembling the
+    concatenation of these files.
+
+    Args:
+        modules (list[ObjectModule]): the modules to link.
+
+    Returns:
+        tuple[array.array, SymbolTable]: the 16-bit machine words, as an array
+        of type "H", and the final symbol table.
+    """
+    table = SymbolTable()
+    base = 0
+    for module in modules:
+        for label, offset in module.labels.items():
+            if table.contains(label):
+                raise ValueError(
+                    "Label defined in more than one module: " + label)
+            table.add_entry(label, base + offset)
+        base += len(module.code)
+
+    words = array.array("H")
+    for module in modules:
+        base = len(words)
+        words.extend(module.code)
+        for position, symbol in module.references:
+            if table.contains(symbol):
+                words[base + position] = table.get_address(symbol)
+            else:
+                words[base + position] = table.add_variable(symbol)
+    return words, table
+
+
+if "__main__" == __name__:
+    # Reads the object modules given as arguments, links them in the given
+    # order and writes the program to the output path.
+    arg_parser = argparse.ArgumentParser(
+        prog="Linker", description="Links Hack object modules (.hobj).")
+    arg_parser.add_argument(
+        "-o", "--output", required=True,
+        help="the .hack (or .bin) file to write")
+    arg_parser.add_argument(
+        "modules", nargs="+",
+        help="the .hobj modules, the first one is placed at address 0")
+    arg_parser.add_argument(
+        "--sym", action="store_true",
+        help="also write a .sym map of every label and variable address")
+    args = arg_parser.parse_args()
+    output_path = os.path.abspath(args.output)
+    filename, extension = os.path.splitext(output_path)
+    modules = []
+    for module_path in args.modules:
+        with open(module_path, 'r') as module_file:
+            try:
+                modules.append(ObjectModule.read(module_file))
+            except ValueError as error:
+                sys.exit("{}: {}".format(module_path, error))
+    try:
+        words, table = link(modules)
+    except ValueError as error:
+        sys.exit(str(error))
+    output_format = "bin" if extension.lower() == ".bin" else "hack"
+    write_if_changed(output_path, render_words(words, output_format))
+    if args.sym:
+        with open(filename + ".sym", 'w') as symbols_file:
+            table.write_symbols(symbols_file)
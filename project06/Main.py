@@ -5,12 +5,35 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import array
+import concurrent.futures
+import contextlib
+import io
+import itertools
 import os
 import sys
 import typing
 from SymbolTable import SymbolTable
-from Parser import Parser
+from Parser import Command, Parser, clean_line, clean_lines, decode_command, \
+    read_lines
 from Code import Code
+from HackImage import write_image
+from AssemblyCache import AssemblyCache, DEFAULT_CACHE_DIR
+from Optimizer import optimize_commands
+from ObjectModule import ObjectModule
+from AssemblerStats import AssemblerStats
+
+# Part of every assembly cache key. Change it whenever a change to the
+# assembler changes its output, so that older cache entries are not reused.
+ASSEMBLER_VERSION = "1"
+
+# With --stats, lines are read this many at a time, see timed_lines
+READ_BATCH_SIZE = 1024
+
+# Chunks of a single file that is assembled in parallel are at least this
+# many commands long, smaller chunks are not worth shipping to a worker.
+MIN_CHUNK_SIZE = 16384
 
 def get_binary(num: int) -> str:
     return format(num, 'b').zfill(16)
@@ -20,115 +43,628 @@ def pad_with_zeros(binary_num):
         more_zeros = 15 - len(binary_num)
         return "0" + ("0" * more_zeros) + binary_num
 
-def translate_a_command(parser_obj: Parser, table_obj: SymbolTable) -> str:
-    symbol = parser_obj.symbol()
-    address = table_obj.get_address(symbol)
-    return get_binary(int(address))
+def encode_c_command(text: str, code: Code) -> int:
+    word = code.c_command(text)
+    if word is None:
+        raise ValueError("Invalid C-command: " + text)
+    return word
 
-def translate_c_command(parser_obj: Parser, code: Code) -> str:
-    return "111" + str(code.comp(parser_obj.comp())) + str(code.dest(parser_obj.dest())) + str(code.jump(parser_obj.jump()))
+def timed(stats: typing.Optional[AssemblerStats],
+          name: str) -> typing.ContextManager:
+    """Times a phase into stats, unless stats is None"""
+    return stats.phase(name) if stats else contextlib.nullcontext()
 
-def translate_l_command(parser_obj: Parser, table_obj: SymbolTable) -> str:
-    return translate_a_command(parser_obj, table_obj)
+def timed_lines(stats: AssemblerStats,
+                lines: typing.Iterable[str]) -> typing.Iterator[str]:
+    """Times reading the lines into the "read" phase of stats, apart from
+    the phase that consumes them. The lines are read in batches of
+    READ_BATCH_SIZE, so the clock is read once per batch rather than once
+    per line."""
+    lines = iter(lines)
+    while True:
+        with stats.phase("read"):
+            batch = list(itertools.islice(lines, READ_BATCH_SIZE))
+        if not batch:
+            return
+        yield from batch
 
-def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
-    """Assembles a single file.
+def add_labels(commands: list[Command], table: SymbolTable) -> None:
+    """The first pass: adds the L command symbols to the table"""
+    address = 0
+    for command in commands:
+        if command.kind == "L_COMMAND":
+            table.add_entry(command.symbol, address)
+        else:
+            address += 1
+
+def encode_commands(
+        commands: list[Command], table: SymbolTable) -> array.array:
+    """The second pass: adds the A command symbols to the table and
+    translates all commands.
 
     Args:
-        input_file (typing.TextIO): the file to assemble.
-        output_file (typing.TextIO): writes all output to this file.
+        commands (list[Command]): the decoded commands of a whole program.
+        table (SymbolTable): holds the labels of the program, see add_labels.
+
+    Returns:
+        array.array: the 16-bit machine words, as an array of type "H".
     """
+    code = Code()
+    words = array.array("H")
+    for command in commands:
+        if command.kind == "A_COMMAND":
+            if command.symbol.isnumeric():
+                words.append(int(command.symbol))
+            elif table.contains(command.symbol):
+                words.append(table.get_address(command.symbol))
+            else:
+                words.append(table.add_variable(command.symbol))
+
+        elif command.kind == "C_COMMAND":
+            words.append(encode_c_command(command.text, code))
+    return words
+
+def assemble_commands(
+        commands: list[Command]) -> tuple[array.array, SymbolTable]:
+    """Assembles decoded commands in two passes.
 
-    # Initializing
-    parser = Parser(input_file)
+    Args:
+        commands (list[Command]): the decoded commands of a whole program.
+
+    Returns:
+        tuple[array.array, SymbolTable]: the 16-bit machine words, as an array
+        of type "H", and the final symbol table.
+    """
+    table = SymbolTable()
+    add_labels(commands, table)
+    return encode_commands(commands, table), table
+
+def assemble_lines_single_pass(
+        lines: typing.Iterable[str]) -> tuple[array.array, SymbolTable]:
+    """Assembles lines of assembly in one streaming pass over them.
+    Every instruction is encoded as soon as it is read. A-commands that
+    refer to a symbol which is not known yet are recorded as forward
+    references and patched once the whole input was read: symbols that
+    turned out to be labels get the label's address, and the rest are
+    allocated as variables in order of first use, exactly like the two-pass
+    assembler does.
+
+    Args:
+        lines (typing.Iterable[str]): the lines of a whole program, with or
+            without their newlines.
+
+    Returns:
+        tuple[array.array, SymbolTable]: the 16-bit machine words, as an array
+        of type "H", and the final symbol table.
+    """
     table = SymbolTable()
     code = Code()
+    words = array.array("H")
+    forward_refs = {}
 
-    # Add L command symbols to the table first
-    i = 0
-    while parser.has_more_commands():
-        if parser.command_type() == "L_COMMAND":
-            if i == 0:
-                table.add_entry(parser.symbol(), i+1)
-                i += 1
-                parser.advance()
-                continue
-            table.add_entry(parser.symbol(), i)
-            parser.advance()
+    for line in lines:
+        command = clean_line(line)
+        if command == "":
             continue
-        i += 1
-        parser.advance()
-        continue
-
-    # Add A command symbols to the table and translate all lines
-    i = 16
-    parser.command_counter = 0
-    parser.cur_com = parser.input_lines[0]
-
-    while parser.has_more_commands():
-        if parser.command_type() == "A_COMMAND":
-            if parser.symbol().isnumeric():
-                output_file.write(get_binary(int(parser.symbol())) + "\n")
-                parser.advance()
-                continue
+        if command[0] == "@":
+            symbol = command[1:]
+            if symbol.isnumeric():
+                words.append(int(symbol))
+            elif table.contains(symbol):
+                words.append(table.get_address(symbol))
             else:
-                if not table.contains(parser.symbol()):
-                    table.add_entry(parser.symbol(), i)
-                    output_file.write(translate_a_command(parser, table) + "\n")
-                    i += 1
-                    parser.advance()
-                    continue
-                else:
-                    output_file.write(translate_a_command(parser, table) + "\n")
-                    parser.advance()
-                    continue
+                # Not known yet, might still be defined as a label later on
+                forward_refs.setdefault(symbol, []).append(len(words))
+                words.append(0)
+        elif command[0] == "(":
+            table.add_entry(command[1:-1], len(words))
+        else:
+            words.append(encode_c_command(command, code))
 
-        elif parser.command_type() == "C_COMMAND":
-            output_file.write(translate_c_command(parser, code) + "\n")
-            parser.advance()
-            continue
+    # Backpatch the forward references
+    for symbol, positions in forward_refs.items():
+        if table.contains(symbol):
+            address = table.get_address(symbol)
+        else:
+            address = table.add_variable(symbol)
+        for position in positions:
+            words[position] = address
+
+    return words, table
 
+def assemble(
+        source: typing.Union[str, typing.Iterable[str]],
+        single_pass: bool = False, optimize: bool = False,
+        stats: typing.Optional[AssemblerStats] = None
+) -> tuple[array.array, SymbolTable]:
+    """Assembles a program held in memory, without any file I/O.
+
+    Args:
+        source (typing.Union[str, typing.Iterable[str]]): the program, either
+            as one string or as an iterable of its lines.
+        single_pass (bool): use the single-pass assembler. Ignored when
+            optimizing, which needs the whole program first.
+        optimize (bool): run the peephole optimizer (see Optimizer) between
+            parsing and encoding.
+        stats (AssemblerStats): times the clean, label and encode phases
+            into these stats, and counts the commands and symbols. The
+            single-pass assembler interleaves these phases, so it is timed
+            as a single phase.
+
+    Returns:
+        tuple[array.array, SymbolTable]: the 16-bit machine words, as an array
+        of type "H", and the final symbol table.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    if single_pass and not optimize:
+        if stats is None:
+            return assemble_lines_single_pass(source)
+        source = list(source)
+        with stats.phase("single pass"):
+            words, table = assemble_lines_single_pass(source)
+        # The single pass does not keep the commands, count them apart
+        stats.count_commands(
+            decode_command(line) for line in clean_lines(source))
+    else:
+        with timed(stats, "clean"):
+            commands = [decode_command(line) for line in clean_lines(source)]
+        if optimize:
+            with timed(stats, "optimize"):
+                commands = optimize_commands(commands)
+        table = SymbolTable()
+        with timed(stats, "labels"):
+            add_labels(commands, table)
+        with timed(stats, "encode"):
+            words = encode_commands(commands, table)
+        if stats:
+            stats.count_commands(commands)
+    if stats:
+        stats.count_symbols(table)
+    return words, table
+
+def assemble_object(
+        source: typing.Union[str, typing.Iterable[str]]) -> ObjectModule:
+    """Assembles a program held in memory into a relocatable object module.
+    Numbers and predefined symbols are encoded right away. Every other symbol
+    is left for the linker (see Linker), which places the module and resolves
+    the symbol to a label of any linked module, or else to a variable.
+
+    Args:
+        source (typing.Union[str, typing.Iterable[str]]): the program, either
+            as one string or as an iterable of its lines.
+
+    Returns:
+        ObjectModule: the object module.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    predefined = SymbolTable()
+    code = Code()
+    words = array.array("H")
+    labels = {}
+    references = []
+    for line in clean_lines(source):
+        command = decode_command(line)
+        if command.kind == "L_COMMAND":
+            labels[command.symbol] = len(words)
+        elif command.kind == "A_COMMAND":
+            if command.symbol.isnumeric():
+                words.append(int(command.symbol))
+            elif predefined.contains(command.symbol):
+                words.append(predefined.get_address(command.symbol))
+            else:
+                references.append((len(words), command.symbol))
+                words.append(0)
         else:
-            parser.advance()
+            words.append(encode_c_command(command.text, code))
+    return ObjectModule(words, labels, references)
+
+def assemble_words(input_file: typing.TextIO) -> array.array:
+    """Assembles a single file into its machine words.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+
+    Returns:
+        array.array: the 16-bit machine words, as an array of type "H".
+    """
+    return assemble_commands(Parser(input_file).commands)[0]
+
+def assemble_words_single_pass(input_file: typing.TextIO) -> array.array:
+    """Assembles a single file into its machine words, in one streaming pass
+    over its lines, see assemble_lines_single_pass.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+
+    Returns:
+        array.array: the 16-bit machine words, as an array of type "H".
+    """
+    return assemble_lines_single_pass(input_file)[0]
+
+def scan_chunk(lines: list[str]) -> tuple[int, dict, list[str]]:
+    """The label pass over a chunk of cleaned commands.
+
+    Args:
+        lines (list[str]): cleaned commands, see Parser.clean_lines.
+
+    Returns:
+        tuple[int, dict, list[str]]: the number of instructions in the chunk,
+        its labels mapped to their address relative to the chunk's start, and
+        the symbols its A-commands refer to, in order of first use.
+    """
+    count = 0
+    labels = {}
+    symbols = {}
+    for line in lines:
+        command = decode_command(line)
+        if command.kind == "L_COMMAND":
+            labels[command.symbol] = count
             continue
-    
-    # We've completed the loop but still need to check the last command
-    if parser.command_type() == "A_COMMAND":
-        if parser.symbol().isnumeric():
-            output_file.write(get_binary(int(parser.symbol())))
-        else:
+        count += 1
+        if command.kind == "A_COMMAND" and not command.symbol.isnumeric():
+            symbols[command.symbol] = None
+    return count, labels, list(symbols)
+
+def merge_scans(scans: list[tuple[int, dict, list[str]]]) -> SymbolTable:
+    """Builds the symbol table of a whole program from the scans of its
+    consecutive chunks: a prefix sum of the instruction counts gives every
+    chunk its base address, and the variables are then allocated in order of
+    first use, exactly like assemble_words does.
+    """
+    table = SymbolTable()
+    address = 0
+    for count, labels, _ in scans:
+        for label, offset in labels.items():
+            table.add_entry(label, address + offset)
+        address += count
+    for _, _, symbols in scans:
+        for symbol in symbols:
+            if not table.contains(symbol):
+                table.add_variable(symbol)
+    return table
 
-            if not table.contains(parser.symbol()):
-                table.add_entry(parser.symbol(), i)
-                output_file.write(translate_a_command(parser, table) + "\n")
+def encode_chunk(lines: list[str], table: SymbolTable) -> array.array:
+    """The encoding pass over a chunk of cleaned commands.
+
+    Args:
+        lines (list[str]): cleaned commands, see Parser.clean_lines.
+        table (SymbolTable): the symbol table of the whole program.
+
+    Returns:
+        array.array: the machine words of the chunk, as an array of type "H".
+    """
+    code = Code()
+    words = array.array("H")
+    for line in lines:
+        command = decode_command(line)
+        if command.kind == "A_COMMAND":
+            if command.symbol.isnumeric():
+                words.append(int(command.symbol))
             else:
-                output_file.write(translate_a_command(parser, table) + "\n")
+                words.append(table.get_address(command.symbol))
+        elif command.kind == "C_COMMAND":
+            words.append(encode_c_command(command.text, code))
+    return words
+
+def assemble_parallel(
+        source: typing.Union[str, typing.Iterable[str]], jobs: int,
+        chunk_size: int = MIN_CHUNK_SIZE,
+        optimize: bool = False) -> tuple[array.array, SymbolTable]:
+    """Assembles a single, large program using several worker processes.
+    The cleaned commands are split into consecutive chunks. The workers first
+    scan the chunks for labels and symbols in parallel, the scans are merged
+    into one symbol table, and the workers then encode the chunks in
+    parallel.
+
+    Args:
+        source (typing.Union[str, typing.Iterable[str]]): the program, either
+            as one string or as an iterable of its lines.
+        jobs (int): the number of worker processes.
+        chunk_size (int): the minimal number of commands in a chunk.
+        optimize (bool): run the peephole optimizer (see Optimizer) before
+            splitting the program into chunks.
+
+    Returns:
+        tuple[array.array, SymbolTable]: the 16-bit machine words, as an array
+        of type "H", and the final symbol table.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    lines = list(clean_lines(source))
+    if optimize:
+        lines = [
+            command.text for command in
+            optimize_commands([decode_command(line) for line in lines])]
+    chunk_size = max(chunk_size, -(-len(lines) // jobs))
+    chunks = [
+        lines[start:start + chunk_size]
+        for start in range(0, len(lines), chunk_size)]
+    words = array.array("H")
+    if len(chunks) <= 1:
+        # Too small to be worth starting worker processes for
+        table = merge_scans([scan_chunk(lines)])
+        words.extend(encode_chunk(lines, table))
+        return words, table
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        table = merge_scans(list(executor.map(scan_chunk, chunks)))
+        for chunk_words in executor.map(
+                encode_chunk, chunks, [table] * len(chunks)):
+            words.extend(chunk_words)
+    return words, table
+
+def write_words(words: array.array, output_file: typing.TextIO) -> None:
+    """Writes machine words in the textual .hack format, one per line."""
+    output_file.writelines(get_binary(word) + "\n" for word in words)
+
+def assemble_file(
+        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+    """Assembles a single file.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    write_words(assemble_words(input_file), output_file)
+
+def assemble_file_single_pass(
+        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+    """Assembles a single file in one streaming pass, see
+    assemble_words_single_pass.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    write_words(assemble_words_single_pass(input_file), output_file)
+
+
+def write_if_changed(
+        output_path: str, output: typing.Union[str, bytes]) -> None:
+    """Writes the output to output_path, unless the file already holds
+    exactly that output. This way its timestamp only changes when the program
+    does.
+
+    Args:
+        output_path (str): the path of the output file.
+        output (typing.Union[str, bytes]): text, or bytes for binary output.
+    """
+    mode = 'b' if isinstance(output, bytes) else ''
+    if os.path.exists(output_path):
+        with open(output_path, 'r' + mode) as output_file:
+            if output_file.read() == output:
+                return
+    with open(output_path, 'w' + mode) as output_file:
+        output_file.write(output)
+
+def render_words(
+        words: array.array, output_format: str) -> typing.Union[str, bytes]:
+    """
+    Args:
+        words (array.array): machine words, as an array of type "H".
+        output_format (str): "hack" for text output, "bin" for a packed image.
+
+    Returns:
+        typing.Union[str, bytes]: the contents of the output file.
+    """
+    if output_format == "bin":
+        output = io.BytesIO()
+        write_image(words, output)
     else:
-        if parser.command_type() == "C_COMMAND":
-            output_file.write(translate_c_command(parser, code) + "\n")
+        output = io.StringIO(newline="")
+        write_words(words, output)
+    return output.getvalue()
+
+def warn_cache_error(error: OSError) -> None:
+    """The cache only saves time, so a cache directory that can not be
+    created or written to is reported, and the file is assembled without
+    it."""
+    print("Not using the assembly cache: {}".format(error), file=sys.stderr)
+
+def assemble_path(
+        input_path: str, single_pass: bool = False,
+        output_format: str = "hack",
+        cache_dir: typing.Optional[str] = None, jobs: int = 1,
+        symbols: bool = False, optimize: bool = False,
+        stats: typing.Optional[AssemblerStats] = None) -> None:
+    """Assembles the .asm file at input_path into a .hack (or .bin, or .hobj)
+    file next to it, opening both files.
+
+    Args:
+        input_path (str): the path of the .asm file to assemble.
+        single_pass (bool): use the single-pass assembler.
+        output_format (str): "hack" for text output, "bin" for a packed image,
+            "obj" for a relocatable object module (see assemble_object).
+        cache_dir (str): the directory of the assembly cache, or None to
+            always assemble.
+        jobs (int): the number of worker processes to split the file across,
+            see assemble_parallel. Overrides single_pass when above 1.
+        symbols (bool): also write a .sym symbol map next to the output, see
+            SymbolTable.write_symbols. The cache only keeps machine words, so
+            this always assembles the file.
+        optimize (bool): run the peephole optimizer, see Optimizer.
+        stats (AssemblerStats): times every phase into these stats, see
+            assemble. Like symbols, this always assembles the file.
+    """
+    filename, extension = os.path.splitext(input_path)
+    if output_format == "obj":
+        # The output is only opened once assembling succeeded, so a failing
+        # file never leaves a truncated output behind
+        output = io.StringIO()
+        with open(input_path, 'r') as input_file:
+            assemble_object(read_lines(input_file)).write(output)
+        write_if_changed(filename + ".hobj", output.getvalue())
+        return
+
+    version = ASSEMBLER_VERSION + ("-optimize" if optimize else "")
+    cache = None
+    if cache_dir:
+        try:
+            cache = AssemblyCache(version, cache_dir)
+        except OSError as error:
+            warn_cache_error(error)
+    words = None
+    if cache and not symbols and not stats:
+        with open(input_path, 'rb') as input_file:
+            words = cache.get(cache.key(input_file))
+    if words is None:
+        # The lines are read lazily, as the assembler consumes them. The file
+        # may change after it was looked up in the cache, so the words are
+        # cached under the hash of the very bytes they were assembled from.
+        digest = cache.digest() if cache else None
+        with open(input_path, 'r') as input_file:
+            lines = read_lines(input_file, digest)
+            if stats:
+                lines = timed_lines(stats, lines)
+            if jobs > 1:
+                words, table = assemble_parallel(
+                    lines, jobs, optimize=optimize)
+            else:
+                words, table = assemble(lines, single_pass, optimize, stats)
+        if cache:
+            try:
+                cache.put(digest.hexdigest(), words)
+            except OSError as error:
+                warn_cache_error(error)
+        if symbols:
+            with timed(stats, "write"):
+                with open(filename + ".sym", 'w') as symbols_file:
+                    table.write_symbols(symbols_file)
+
+    # The output is only opened once assembling succeeded, so a failing file
+    # never leaves a truncated output behind
+    extension = ".bin" if output_format == "bin" else ".hack"
+    with timed(stats, "write"):
+        write_if_changed(
+            filename + extension, render_words(words, output_format))
+
+def assemble_paths(
+        input_paths: list[str], jobs: int = 1, single_pass: bool = False,
+        output_format: str = "hack", cache_dir: typing.Optional[str] = None,
+        symbols: bool = False, optimize: bool = False,
+        stats_format: typing.Optional[str] = None
+) -> list[tuple[str, Exception]]:
+    """Assembles several .asm files, each into its own output file.
+    A failure in one file does not stop the others from being assembled.
+
+    Args:
+        input_paths (list[str]): the paths of the .asm files to assemble.
+        jobs (int): the number of worker processes to spread the files
+            across. With 1, the files are assembled in this process. A single
+            file is split across the workers instead.
+        single_pass (bool): use the single-pass assembler.
+        output_format (str): "hack" for text output, "bin" for a packed image,
+            "obj" for a relocatable object module.
+        cache_dir (str): the directory of the assembly cache, or None to
+            always assemble.
+        symbols (bool): also write a .sym symbol map for every file.
+        optimize (bool): run the peephole optimizer, see Optimizer.
+        stats_format (str): "text" or "json" to write the timings and
+            counters of every file to stdout (see AssemblerStats), or None.
+            Only supported with a single job.
+
+    Returns:
+        list[tuple[str, Exception]]: the (input path, error) pairs of the
+        files that failed, in the same order as input_paths.
+    """
+    errors = []
+    if jobs == 1 or len(input_paths) == 1:
+        for input_path in input_paths:
+            try:
+                if stats_format:
+                    stats = AssemblerStats(input_path)
+                    with stats.trace_memory():
+                        assemble_path(
+                            input_path, single_pass, output_format,
+                            cache_dir, jobs, symbols, optimize, stats)
+                    stats.write(sys.stdout, stats_format)
+                else:
+                    assemble_path(
+                        input_path, single_pass, output_format, cache_dir,
+                        jobs, symbols, optimize)
+            except Exception as error:
+                errors.append((input_path, error))
+        return errors
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                assemble_path, input_path, single_pass, output_format,
+                cache_dir, 1, symbols, optimize)
+            for input_path in input_paths]
+        for input_path, future in zip(input_paths, futures):
+            try:
+                future.result()
+            except Exception as error:
+                errors.append((input_path, error))
+    return errors
+
 
-    
 if "__main__" == __name__:
-    # Parses the input path and calls assemble_file on each input file.
+    # Parses the input path and assembles each input file.
     # This opens both the input and the output files!
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="Assembler", description="Assembles Hack assembly files.")
+    arg_parser.add_argument("path", help="an .asm file or a directory")
+    arg_parser.add_argument(
+        "--single-pass", action="store_true",
+        help="assemble in one streaming pass, backpatching forward labels")
+    arg_parser.add_argument(
+        "--format", choices=["hack", "bin", "obj"], default="hack",
+        help="write textual .hack files, packed binary .bin images, or "
+             "relocatable .hobj object modules for the Linker")
+    arg_parser.add_argument(
+        "-j", "--jobs", type=int, default=1, metavar="N",
+        help="assemble the files of a directory, or the chunks of a single "
+             "file, in N worker processes")
+    arg_parser.add_argument(
+        "--cache-dir", default=DEFAULT_CACHE_DIR,
+        help="where to cache assembled programs (default: %(default)s)")
+    arg_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="always assemble, without reading or writing the cache")
+    arg_parser.add_argument(
+        "--sym", action="store_true",
+        help="also write a .sym map of every label and variable address")
+    arg_parser.add_argument(
+        "--optimize", action="store_true",
+        help="run the peephole optimizer between parsing and encoding")
+    arg_parser.add_argument(
+        "--stats", choices=["text", "json"],
+        help="write the time taken by every phase, the number of commands "
+             "and symbols, and the peak memory use of every file to stdout, "
+             "as a table (--stats) or as one line of JSON per file "
+             "(--stats=json)")
+    # A bare --stats means --stats=text, without taking the next argument as
+    # its value
+    args = arg_parser.parse_args([
+        "--stats=text" if arg == "--stats" else arg for arg in sys.argv[1:]])
+    if args.jobs < 1:
+        arg_parser.error("-j must be at least 1")
+    if args.format == "obj" and (args.optimize or args.sym):
+        # Both need the whole program, which only the Linker sees
+        arg_parser.error("--optimize and --sym cannot be used with --format=obj")
+    if args.stats and (args.jobs > 1 or args.format == "obj"):
+        arg_parser.error("--stats cannot be used with -j or --format=obj")
+    argument_path = os.path.abspath(args.path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
\ No newline at end of file
+    files_to_assemble = [
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".asm"]
+    errors = assemble_paths(
+        files_to_assemble, args.jobs, args.single_pass, args.format,
+        None if args.no_cache else args.cache_dir, args.sym, args.optimize,
+        args.stats)
+    for input_path, error in errors:
+        print("{}: {}".format(input_path, error), file=sys.stderr)
+    if errors:
+        sys.exit("Failed to assemble {} of {} files".format(
+            len(errors), len(files_to_assemble)))
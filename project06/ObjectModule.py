@@ -0,0 +1,84 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import json
+import typing
+
+OBJECT_FORMAT = "hack-object"
+OBJECT_VERSION = 1
+
+
+class ObjectModule:
+    """A relocatable object module: the machine words of one assembly file,
+    encoded as if the file started at ROM address 0, along with what a linker
+    needs in order to place it anywhere in a bigger program.
+    """
+
+    def __init__(self, code: array.array, labels: dict[str, int],
+                 references: list[tuple[int, str]]) -> None:
+        """Creates a new object module.
+
+        Args:
+            code (array.array): the machine words, as an array of type "H".
+                Words that refer to a symbol hold 0 until they are linked.
+            labels (dict[str, int]): the labels the module defines, mapped to
+                their address relative to the start of the module. All of
+                them are exported.
+            references (list[tuple[int, str]]): the (position, symbol) pairs
+                of every A-command that refers to a label or a variable,
+                ordered by position.
+        """
+        self.code = code
+        self.labels = labels
+        self.references = references
+
+    def externals(self) -> list[str]:
+        """
+        Returns:
+            list[str]: the symbols the module refers to but does not define,
+            in order of first use. The linker resolves each of them to a
+            label of another module, or else allocates it as a variable.
+        """
+        externals = {}
+        for _, symbol in self.references:
+            if symbol not in self.labels:
+                externals[symbol] = None
+        return list(externals)
+
+    def write(self, output_file: typing.TextIO) -> None:
+        """Writes the module as JSON.
+
+        Args:
+            output_file (typing.TextIO): writes the module to this file.
+        """
+        json.dump({
+            "format": OBJECT_FORMAT,
+            "version": OBJECT_VERSION,
+            "code": self.code.tolist(),
+            "labels": self.labels,
+            "references": self.references,
+        }, output_file)
+
+    @staticmethod
+    def read(input_file: typing.TextIO) -> "ObjectModule":
+        """Reads a module that was written by write.
+
+        Args:
+            input_file (typing.TextIO): the object file.
+
+        Returns:
+            ObjectModule: the module.
+        """
+        contents = json.load(input_file)
+        if contents.get("format") != OBJECT_FORMAT \
+                or contents.get("version") != OBJECT_VERSION:
+            raise ValueError("Not a Hack object module")
+        return ObjectModule(
+            array.array("H", contents["code"]), contents["labels"],
+            [(position, symbol)
+             for position, symbol in contents["references"]])
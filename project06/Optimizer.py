@@ -0,0 +1,191 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from Parser import Command, decode_command
+
+# Reading these addresses twice may give different values, even though the
+# program did not write to them in between
+VOLATILE_SYMBOLS = {"KBD", "24576"}
+
+
+def referenced_symbols(commands: list[Command]) -> set[str]:
+    """
+    Returns:
+        set[str]: every symbol that an A-command of the program refers to.
+    """
+    return {
+        command.symbol for command in commands
+        if command.kind == "A_COMMAND"}
+
+def is_unconditional_jump(command: Command) -> bool:
+    return command.kind == "C_COMMAND" and command.jump == "JMP"
+
+def is_goto(command: Command) -> bool:
+    """Is this a plain "0;JMP", without any side effects besides jumping?"""
+    return is_unconditional_jump(command) and command.dest == ""
+
+def next_instruction(commands: list[Command], start: int) -> int:
+    """
+    Returns:
+        int: the index of the first command from start on that is not a
+        label, or len(commands) if there is none.
+    """
+    while start < len(commands) and commands[start].kind == "L_COMMAND":
+        start += 1
+    return start
+
+def follow_label_chains(commands: list[Command]) -> list[Command]:
+    """Redirects references to a label that is immediately followed by
+    "@OTHER, 0;JMP" straight to OTHER, following chains of such labels.
+    """
+    labels = {
+        command.symbol for command in commands
+        if command.kind == "L_COMMAND"}
+    aliases = {}
+    for i, command in enumerate(commands):
+        if command.kind != "L_COMMAND":
+            continue
+        target = next_instruction(commands, i + 1)
+        if target + 1 < len(commands) \
+                and commands[target].kind == "A_COMMAND" \
+                and commands[target].symbol in labels \
+                and is_goto(commands[target + 1]):
+            aliases[command.symbol] = commands[target].symbol
+
+    def resolve(label: str) -> str:
+        seen = {label}
+        while label in aliases and aliases[label] not in seen:
+            label = aliases[label]
+            seen.add(label)
+        return label
+
+    optimized = []
+    for command in commands:
+        if command.kind == "A_COMMAND" and command.symbol in aliases:
+            target = resolve(command.symbol)
+            if target != command.symbol:
+                command = decode_command("@" + target)
+        optimized.append(command)
+    return optimized
+
+def remove_unreachable_code(commands: list[Command]) -> list[Command]:
+    """Removes the instructions that follow an unconditional jump, up to the
+    next label that the program refers to.
+    """
+    referenced = referenced_symbols(commands)
+    optimized = []
+    reachable = True
+    for command in commands:
+        if command.kind == "L_COMMAND" and command.symbol in referenced:
+            reachable = True
+        if reachable:
+            optimized.append(command)
+            if is_unconditional_jump(command):
+                reachable = False
+    return optimized
+
+def remove_jumps_to_next(commands: list[Command]) -> list[Command]:
+    """Removes "@L, comp;jump" pairs that jump to a label L right after them,
+    as long as the code at L sets A before using it.
+    """
+    optimized = []
+    i = 0
+    while i < len(commands):
+        command = commands[i]
+        if command.kind == "A_COMMAND" and i + 1 < len(commands) \
+                and commands[i + 1].kind == "C_COMMAND" \
+                and commands[i + 1].jump != "" \
+                and commands[i + 1].dest == "":
+            end = next_instruction(commands, i + 2)
+            jumps_to_next = any(
+                label.symbol == command.symbol
+                for label in commands[i + 2:end])
+            if jumps_to_next and (end == len(commands)
+                                  or commands[end].kind == "A_COMMAND"):
+                i += 2
+                continue
+        optimized.append(command)
+        i += 1
+    return optimized
+
+def remove_redundant_loads(commands: list[Command]) -> list[Command]:
+    """Removes loads whose value is already in place: "@X" while A already
+    holds X, "D=M" or "D=A" while D already holds that value, and "M=D" while
+    M already holds D.
+    The symbol in A, and what D holds as a (comp, symbol) pair, are tracked
+    along straight-line code and forgotten at every label that is jumped to.
+    """
+    referenced = referenced_symbols(commands)
+    optimized = []
+    a_symbol = None
+    d_value = None
+    for command in commands:
+        if command.kind == "L_COMMAND":
+            if command.symbol in referenced:
+                a_symbol = None
+                d_value = None
+            optimized.append(command)
+            continue
+
+        if command.kind == "A_COMMAND":
+            if command.symbol != a_symbol:
+                a_symbol = command.symbol
+                optimized.append(command)
+            continue
+
+        tracked = a_symbol is not None and a_symbol not in VOLATILE_SYMBOLS
+        if tracked and command.jump == "":
+            if command.dest == "D" and command.comp in ("M", "A") \
+                    and d_value == (command.comp, a_symbol):
+                continue
+            if command.dest == "M" and command.comp == "D" \
+                    and d_value == ("M", a_symbol):
+                continue
+        optimized.append(command)
+
+        writes_d = "D" in command.dest
+        writes_m = "M" in command.dest
+        if writes_d and writes_m:
+            # D and RAM[A] both hold the result now
+            d_value = ("M", a_symbol) if tracked else None
+        elif writes_d:
+            if tracked and command.comp in ("M", "A"):
+                d_value = (command.comp, a_symbol)
+            else:
+                d_value = None
+        elif writes_m:
+            if tracked and command.comp == "D":
+                d_value = ("M", a_symbol)
+            elif d_value is not None and d_value[0] == "M":
+                # The write may alias the address D was loaded from
+                d_value = None
+        if "A" in command.dest:
+            a_symbol = None
+    return optimized
+
+def optimize_commands(commands: list[Command]) -> list[Command]:
+    """Runs peephole optimizations over a decoded program until none of them
+    applies anymore.
+    The optimized program behaves the same as long as it only refers to ROM
+    addresses through labels, which is always the case for code generated by
+    the VM translator.
+
+    Args:
+        commands (list[Command]): the decoded commands of a whole program.
+
+    Returns:
+        list[Command]: the optimized commands.
+    """
+    while True:
+        optimized = follow_label_chains(commands)
+        optimized = remove_unreachable_code(optimized)
+        optimized = remove_jumps_to_next(optimized)
+        optimized = remove_redundant_loads(optimized)
+        if [command.text for command in optimized] \
+                == [command.text for command in commands]:
+            return optimized
+        commands = optimized
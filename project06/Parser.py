@@ -5,6 +5,10 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import functools
+import io
+import mmap
+import os
 import typing
 
 def remove_newline(list_strings: list[str]) -> list:
@@ -39,6 +43,108 @@ def remove_empty_strings(list_strings: list[str]) -> list:
 def fix_input(list_strings: list[str]) -> list:
     return remove_empty_strings(remove_comments(remove_whitespace(remove_newline(list_strings))))
 
+def clean_line(line: str) -> str:
+    """Removes the newline, whitespace and comment of a single line, the same
+    way fix_input does for a whole list"""
+    return line.replace("\n", "").replace(" ", "").split("/", 1)[0]
+
+def clean_lines(lines: typing.Iterable[str]) -> typing.Iterator[str]:
+    """Yields the non-empty cleaned lines one at a time, see clean_line. This
+    gives the same commands as fix_input, without building a list"""
+    for line in lines:
+        command = clean_line(line)
+        if command != "":
+            yield command
+
+def read_lines(input_file: typing.TextIO,
+               digest: typing.Any = None) -> typing.Iterator[str]:
+    """Yields the lines of an assembly file one at a time, without their
+    newlines. A file on disk is memory mapped and read line by line, so its
+    text is never held in memory as a whole. Lines are split exactly like
+    str.splitlines splits the whole text.
+
+    Args:
+        input_file (typing.TextIO): a file opened for reading, from its
+            start.
+        digest (typing.Any): a hash (see hashlib) to update with the bytes of
+            every line as it is read, or None.
+
+    Returns:
+        typing.Iterator[str]: the lines of the file.
+    """
+    try:
+        size = os.fstat(input_file.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        # Not backed by a file descriptor, e.g. io.StringIO
+        size = 0
+    encoding = getattr(input_file, "encoding", None) or "utf-8"
+    if size == 0:
+        # An empty file cannot be mapped
+        for chunk in input_file:
+            if digest is not None:
+                digest.update(chunk.encode(encoding))
+            yield from chunk.splitlines()
+        return
+    with mmap.mmap(
+            input_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for chunk in iter(mapped.readline, b""):
+            if digest is not None:
+                digest.update(chunk)
+            yield from chunk.decode(encoding).splitlines()
+
+def read_commands(input_file: typing.TextIO) -> typing.Iterator[str]:
+    """Yields the cleaned commands of an assembly file one at a time, see
+    read_lines.
+
+    Args:
+        input_file (typing.TextIO): a file opened for reading, from its
+            start.
+
+    Returns:
+        typing.Iterator[str]: the cleaned commands, see fix_input.
+    """
+    return clean_lines(read_lines(input_file))
+
+def split_c_command(command: str) -> tuple[str, str, str]:
+    """Splits a C-command into its (dest, comp, jump) mnemonics"""
+    dest, comp, jump = "", command, ""
+    if "=" in comp:
+        dest, comp = comp.split("=", 1)
+    if ";" in comp:
+        comp, jump = comp.split(";", 1)
+    return dest, comp, jump
+
+class Command:
+    """A single assembly command, decoded once into its fields.
+    kind is "A_COMMAND", "C_COMMAND" or "L_COMMAND" and text is the cleaned
+    command. symbol is only set for A and L commands, and dest, comp and jump
+    only for C commands.
+    Equal lines share a single Command (see decode_command), so a Command
+    must never be modified.
+    """
+    __slots__ = ("kind", "text", "symbol", "dest", "comp", "jump")
+
+    def __init__(self, kind: str, text: str, symbol: str = "", dest: str = "",
+                 comp: str = "", jump: str = "") -> None:
+        self.kind = kind
+        self.text = text
+        self.symbol = symbol
+        self.dest = dest
+        self.comp = comp
+        self.jump = jump
+
+@functools.lru_cache(maxsize=4096)
+def decode_command(command: str) -> Command:
+    """Decodes a cleaned command string into a Command record. Programs
+    repeat the same few hundred commands over and over, so recently decoded
+    records are reused instead of decoding every line anew"""
+    if command[0] == "@":
+        return Command("A_COMMAND", command, symbol=command[1:])
+    elif command[0] == "(":
+        return Command("L_COMMAND", command, symbol=command[1:-1])
+    dest, comp, jump = split_c_command(command)
+    return Command("C_COMMAND", command, dest=dest, comp=comp, jump=jump)
+
 class Parser:
     """Encapsulates access to the input code. Reads an assembly program
     by reading each command line-by-line, parses the current command,
@@ -51,10 +157,14 @@ class Parser:
         Args:
             input_file (typing.TextIO): input file.
         """
-        self.input_lines = fix_input(input_file.read().splitlines())
-        self.num_commands = len(self.input_lines)
+        # Only the decoded commands are kept, the text of the file is read
+        # and cleaned lazily, see read_commands
+        self.commands = [
+            decode_command(line) for line in read_commands(input_file)]
+        self.num_commands = len(self.commands)
         self.command_counter = 0
-        self.cur_com = self.input_lines[self.command_counter]
+        self.cur = self.commands[self.command_counter]
+        self.cur_com = self.cur.text
 
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
@@ -70,7 +180,8 @@ class Parser:
         """
         if self.has_more_commands():
             self.command_counter += 1
-            self.cur_com = self.input_lines[self.command_counter]
+            self.cur = self.commands[self.command_counter]
+            self.cur_com = self.cur.text
 
     def command_type(self) -> str:
         """
@@ -80,11 +191,7 @@ class Parser:
             "C_COMMAND" for dest=comp;jump
             "L_COMMAND" (actually, pseudo-command) for (Xxx) where Xxx is a symbol
         """
-        if "@" in self.cur_com:
-            return "A_COMMAND"
-        elif "(" in self.cur_com:
-            return "L_COMMAND"
-        return "C_COMMAND"
+        return self.cur.kind
 
     def symbol(self) -> str:
         """
@@ -93,10 +200,8 @@ class Parser:
             (Xxx). Should be called only when command_type() is "A_COMMAND" or 
             "L_COMMAND".
         """
-        if self.command_type() == "A_COMMAND":
-            return self.cur_com[1:]
-        elif self.command_type() == "L_COMMAND":
-            return self.cur_com[1:len(self.cur_com)-1]
+        if self.cur.kind != "C_COMMAND":
+            return self.cur.symbol
 
     def dest(self) -> str:
         """
@@ -104,11 +209,8 @@ class Parser:
             str: the dest mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        if self.command_type() == "C_COMMAND":
-            if "=" in self.cur_com:
-                eq_i = self.cur_com.find("=")
-                return self.cur_com[:eq_i]
-            return ""
+        if self.cur.kind == "C_COMMAND":
+            return self.cur.dest
 
     def comp(self) -> str:
         """
@@ -116,26 +218,14 @@ class Parser:
             str: the comp mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        if self.command_type() == "C_COMMAND":
-            if "=" in self.cur_com and not ";" in self.cur_com:
-                after_eq_i = self.cur_com.find("=")+1
-                return self.cur_com[after_eq_i:]
-            elif ";" in self.cur_com and not "=" in self.cur_com:
-                jump_i = self.cur_com.find(";")
-                return self.cur_com[:jump_i]
-            elif "=" in self.cur_com and ";" in self.cur_com:
-                after_eq_i = self.cur_com.find("=")+1
-                jump_i = self.cur_com.find(";")
-                return self.cur_com[after_eq_i:jump_i]
-        
+        if self.cur.kind == "C_COMMAND":
+            return self.cur.comp
+
     def jump(self) -> str:
         """
         Returns:
             str: the jump mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        if self.command_type() == "C_COMMAND":
-            if ";" in self.cur_com:
-                after_jump_i = self.cur_com.find(";") + 1
-                return self.cur_com[after_jump_i:]
-            return ""
+        if self.cur.kind == "C_COMMAND":
+            return self.cur.jump
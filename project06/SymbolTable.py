@@ -5,6 +5,7 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import typing
 
 class SymbolTable:
     """
@@ -17,19 +18,38 @@ class SymbolTable:
         and their pre-allocated RAM addresses, according to section 6.2.3 of the
         book.
         """
-        self.table = {"R0": "0", "R1": "1", "R2": "2", "R3": "3", "R4": "4", "R5": "5", "R6": "6", "R7": "7", "R8": "8",
-                      "R9": "9", "R10": "10", "R11": "11", "R12": "12", "R13": "13", "R14": "14", "R15": "15",
-                      "SP": "0", "LCL": "1", "ARG": "2", "THIS": "3", "THAT": "4", "SCREEN": "16384", "KBD": "24576"}
-
+        self.table = {"R0": 0, "R1": 1, "R2": 2, "R3": 3, "R4": 4, "R5": 5, "R6": 6, "R7": 7, "R8": 8,
+                      "R9": 9, "R10": 10, "R11": 11, "R12": 12, "R13": 13, "R14": 14, "R15": 15,
+                      "SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4, "SCREEN": 16384, "KBD": 24576}
+        # The kind of every symbol that is not predefined, "label" or "variable"
+        self.kinds = {}
+        # Variables are allocated consecutively, starting at RAM[16]
+        self.next_variable = 16
 
     def add_entry(self, symbol: str, address: int) -> None:
-        """Adds the pair (symbol, address) to the table.
+        """Adds the pair (symbol, address) to the table, as a label.
 
         Args:
             symbol (str): the symbol to add.
             address (int): the address corresponding to the symbol.
         """
-        self.table[symbol] = str(address)
+        self.table[symbol] = address
+        self.kinds[symbol] = "label"
+
+    def add_variable(self, symbol: str) -> int:
+        """Allocates the next free RAM address to the given variable.
+
+        Args:
+            symbol (str): the variable to add.
+
+        Returns:
+            int: the address allocated to the variable.
+        """
+        address = self.next_variable
+        self.table[symbol] = address
+        self.kinds[symbol] = "variable"
+        self.next_variable += 1
+        return address
 
     def contains(self, symbol: str) -> bool:
         """Does the symbol table contain the given symbol?
@@ -52,4 +72,19 @@ class SymbolTable:
             int: the address associated with the symbol.
         """
         if self.contains(symbol):
-            return self.table[symbol]
\ No newline at end of file
+            return self.table[symbol]
+
+    def write_symbols(self, output_file: typing.TextIO) -> None:
+        """Writes a symbol map of the labels and variables in the table, one
+        "<name> <address> <kind>" line each. Labels come first, ordered by
+        their ROM address, and variables follow, ordered by their RAM address.
+
+        Args:
+            output_file (typing.TextIO): writes the symbol map to this file.
+        """
+        symbols = sorted(
+            self.kinds,
+            key=lambda symbol: (self.kinds[symbol] != "label", self.table[symbol]))
+        for symbol in symbols:
+            output_file.write("{} {} {}\n".format(
+                symbol, self.table[symbol], self.kinds[symbol]))
@@ -9,6 +9,147 @@ import typing
 
 SEGMENT_SYMBOL_DICT = {"local": "@LCL", "argument": "@ARG", "this": "@THIS", "that": "@THAT"}
 
+
+def render(*lines: str) -> str:
+    """Joins lines of assembly into a template, one line per argument"""
+    return "".join(line + "\n" for line in lines)
+
+# Every VM command is translated by formatting a single pre-rendered template
+# and writing the result at once. The templates hold the comment of the
+# command too, and are formatted with the fields:
+# {index}: the index of a push or pop.
+# {prefix}: the name of the current file, for static variables.
+# {suffix}: a running counter, makes the labels of a comparison unique.
+
+def render_comparison(command: str) -> str:
+    """The template of eq, gt or lt. Comparing the signs of the operands
+    first makes sure that subtracting them can not overflow."""
+    return render(
+        "// " + command,
+        "@SP",
+        "M=M-1",
+        "A=M",
+        "D=M",
+        "@R13",
+        "M=D",
+        "@Y_NEG_{suffix}", # jump to Y_NEG_i if y is negative
+        "D;JLT",
+        "@SP", # else check if x is negative
+        "M=M-1",
+        "A=M",
+        "D=M",
+        "@Y_POS_X_NEG_{suffix}", # jump to Y_POS_X_NEG_i if x is negative
+        "D;JLT",
+        "@R13",
+        "D=D-M",
+        "@END_{suffix}", # jump to END_i if both are positive
+        "0;JMP",
+        "(Y_NEG_{suffix})",
+        "@SP",
+        "M=M-1",
+        "A=M",
+        "D=M",
+        "@Y_NEG_X_POS_{suffix}", # jump to Y_NEG_X_POS_i if x is positive
+        "D;JGT",
+        "@R13",
+        "D=D-M",
+        "@END_{suffix}",
+        "0;JMP",
+        "(Y_POS_X_NEG_{suffix})",
+        "D=-1",
+        "@END_{suffix}",
+        "0;JMP",
+        "(Y_NEG_X_POS_{suffix})",
+        "D=1",
+        "@END_{suffix}",
+        "0;JMP",
+        "(END_{suffix})",
+        "@TRUE_{suffix}",
+        "D;J" + command.upper(),
+        "D=0",
+        "@FINALIZE_{suffix}",
+        "0;JMP",
+        "(TRUE_{suffix})",
+        "D=-1",
+        "@FINALIZE_{suffix}",
+        "0;JMP",
+        "(FINALIZE_{suffix})",
+        "@SP",
+        "A=M",
+        "M=D",
+        "@SP",
+        "M=M+1")
+
+def render_binary(command: str, operation: str) -> str:
+    """The template of an arithmetic command that pops y and replaces x with
+    the result of operation, which computes M from x in M and y in D."""
+    return render(
+        "// " + command, "@SP", "A=M-1", "D=M", "A=A-1", operation, "@SP",
+        "M=M-1")
+
+def render_unary(command: str, operation: str) -> str:
+    """The template of an arithmetic command that replaces the top of the
+    stack with the result of operation on M."""
+    return render("// " + command, "@SP", "A=M-1", operation)
+
+ARITHMETIC_TEMPLATES = {
+    "add": render("// add", "@SP", "A=M-1", "D=M", "A=A-1", "D=D+M", "M=D",
+                  "@SP", "M=M-1"),
+    "sub": render_binary("sub", "M=M-D"),
+    "neg": render_unary("neg", "M=-M"),
+    "eq": render_comparison("eq"),
+    "gt": render_comparison("gt"),
+    "lt": render_comparison("lt"),
+    "and": render_binary("and", "M=M&D"),
+    "or": render_binary("or", "M=M|D"),
+    "not": render_unary("not", "M=!M"),
+    "shiftright": render_unary("shiftright", "M=M>>"),
+    "shiftleft": render_unary("shiftleft", "M=M<<"),
+}
+
+# Pushes D
+PUSH_D = render("@SP", "A=M", "M=D", "@SP", "M=M+1")
+
+# Pops into the address held by R13
+def render_pop_to(variable: str) -> str:
+    return render(
+        variable, "M=D", "@SP", "A=M-1", "D=M", variable, "A=M", "M=D", "@SP",
+        "M=M-1")
+
+def build_push_pop_templates() -> dict[tuple[str, str], str]:
+    templates = {
+        ("C_PUSH", "constant"):
+            render("// push constant {index}", "@{index}", "D=A") + PUSH_D,
+        ("C_PUSH", "pointer"):
+            render("// push pointer {index}", "@THIS", "D=A", "@{index}",
+                   "D=D+A", "A=D", "D=M") + PUSH_D, # add 0 or 1 to @THIS
+        ("C_PUSH", "temp"):
+            render("// push temp {index}", "@5", "D=A", "@{index}", "D=D+A",
+                   "A=D", "D=M") + PUSH_D,
+        ("C_PUSH", "static"):
+            render("// push static {index}", "@{prefix}.{index}", "D=M")
+            + PUSH_D,
+        ("C_POP", "pointer"):
+            render("// pop pointer {index}", "@THIS", "D=A", "@{index}",
+                   "D=D+A") + render_pop_to("@R13"),
+        ("C_POP", "temp"):
+            render("// pop temp {index}", "@5", "D=A", "@{index}", "D=D+A")
+            + render_pop_to("@R13"),
+        ("C_POP", "static"):
+            render("// pop static {index}", "@SP", "A=M-1", "D=M",
+                   "@{prefix}.{index}", "M=D", "@SP", "M=M-1"),
+    }
+    for segment, symbol in SEGMENT_SYMBOL_DICT.items():
+        templates["C_PUSH", segment] = render(
+            "// push " + segment + " {index}", "@{index}", "D=A", symbol,
+            "A=D+M", "D=M") + PUSH_D
+        templates["C_POP", segment] = render(
+            "// pop " + segment + " {index}", "@{index}", "D=A", symbol,
+            "D=D+M") + render_pop_to("@R13")
+    return templates
+
+PUSH_POP_TEMPLATES = build_push_pop_templates()
+
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
@@ -19,6 +160,8 @@ class CodeWriter:
             output_stream (typing.TextIO): output stream.
         """
         self.output = output_stream
+        self.filename = ""
+        self.file_prefix = ""
         self.counter = 0
 
     def set_file_name(self, filename: str) -> None:
@@ -29,6 +172,7 @@ class CodeWriter:
             filename (str): The name of the VM file.
         """
         self.filename = filename
+        self.file_prefix = filename.split(".")[0]
         # Your code goes here!
         # This function is useful when translating code that handles the
         # static segment. For example, in order to prevent collisions between two
@@ -49,120 +193,8 @@ class CodeWriter:
         Args:
             command (str): an arithmetic command.
         """
-        self.output.write("// " + command + "\n")
-        if command == "add":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("D=D+M\n")
-            self.output.write("M=D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "sub":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("M=M-D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "neg":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=-M\n")
-
-        
-        elif command in ["eq", "gt", "lt"]:
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-            self.output.write("A=M\n")
-            self.output.write("D=M\n")
-            self.output.write("@R13\n")
-            self.output.write("M=D\n")
-            self.output.write("@Y_NEG_{}\n".format(self.counter)) # jump to Y_NEG_i if y is negative
-            self.output.write("D;JLT\n")
-            self.output.write("@SP\n") # else check if x is negative
-            self.output.write("M=M-1\n")
-            self.output.write("A=M\n")
-            self.output.write("D=M\n")
-            self.output.write("@Y_POS_X_NEG_{}\n".format(self.counter)) # jump to Y_POS_X_NEG_i if x is negative
-            self.output.write("D;JLT\n")
-            self.output.write("@R13\n")
-            self.output.write("D=D-M\n") 
-            self.output.write("@END_{}\n".format(self.counter)) # jump to END_i if both are positive
-            self.output.write("0;JMP\n")
-            self.output.write("(Y_NEG_{})\n".format(self.counter)) 
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-            self.output.write("A=M\n")
-            self.output.write("D=M\n")
-            self.output.write("@Y_NEG_X_POS_{}\n".format(self.counter)) # jump to Y_NEG_X_POS_i if x is positive
-            self.output.write("D;JGT\n")
-            self.output.write("@R13\n")
-            self.output.write("D=D-M\n")
-            self.output.write("@END_{}\n".format(self.counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(Y_POS_X_NEG_{})\n".format(self.counter))
-            self.output.write("D=-1\n")
-            self.output.write("@END_{}\n".format(self.counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(Y_NEG_X_POS_{})\n".format(self.counter))
-            self.output.write("D=1\n")
-            self.output.write("@END_{}\n".format(self.counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(END_{})\n".format(self.counter))
-            self.output.write("@TRUE_{}\n".format(self.counter))
-            self.output.write("D;J{}\n".format(command.upper()))
-            self.output.write("D=0\n")
-            self.output.write("@FINALIZE_{}\n".format(self.counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(TRUE_{})\n".format(self.counter))
-            self.output.write("D=-1\n")
-            self.output.write("@FINALIZE_{}\n".format(self.counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(FINALIZE_{})\n".format(self.counter))
-            self.output.write("@SP\n")
-            self.output.write("A=M\n")
-            self.output.write("M=D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M+1\n") 
-
-        elif command == "and":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("M=M&D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "or":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("M=M|D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "not":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=!M\n")
-
-        elif command == "shiftright":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=>>M\n")
-
-        elif command == "shiftleft":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=<<M\n")
-        
+        template = ARITHMETIC_TEMPLATES.get(command, "// " + command + "\n")
+        self.output.write(template.format(suffix=self.counter))
         self.counter += 1         
 
     def write_push_pop(self, command: str, segment: str, index: int) -> None:
@@ -178,121 +210,11 @@ class CodeWriter:
         # be translated to the assembly symbol "Xxx.i". In the subsequent
         # assembly process, the Hack assembler will allocate these symbolic
         # variables to the RAM, starting at address 16.
-        self.output.write("// " + str(command.lower()[2:]) + " " + str(segment) + " " + str(index) + "\n")
-        if command == "C_PUSH":
-            if segment == "constant":
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=A\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-            elif segment in SEGMENT_SYMBOL_DICT: # = {"local": "@LCL", "argument": "@ARG", "this": "@THIS", "that": "@THAT"}
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=A\n")
-                self.output.write("{}\n".format(SEGMENT_SYMBOL_DICT[segment]))
-                self.output.write("A=D+M\n")
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-            
-            elif segment == "pointer":
-                self.output.write("@THIS\n") # add 0 or 1 to @THIS
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("A=D\n")
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-            elif segment == "temp":
-                self.output.write("@5\n")
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("A=D\n")
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-            elif segment == "static":
-                self.output.write("@{Xxx}.{i}\n".format(Xxx=self.filename.split(".")[0], i=index))
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-        elif command == "C_POP":
-            if segment in SEGMENT_SYMBOL_DICT: # = {"local": "@LCL", "argument": "@ARG", "this": "@THIS", "that": "@THAT"}
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=A\n")
-                self.output.write("{}\n".format(SEGMENT_SYMBOL_DICT[segment]))
-                self.output.write("D=D+M\n")
-                self.output.write("@R13\n") # temporary register to store the address
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@R13\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
-            
-            elif segment == "pointer":
-                self.output.write("@THIS\n") # add 0 or 1 to @THIS
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("@R13\n") # temporary register to store the address
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@R13\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
-
-            elif segment == "temp":
-                self.output.write("@5\n")
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("@R13\n") # temporary register to store the address
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@R13\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
-            
-            elif segment == "static":
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@{Xxx}.{i}\n".format(Xxx=self.filename.split(".")[0], i=index))
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
+        template = PUSH_POP_TEMPLATES.get((command, segment))
+        if template is None:
+            self.output.write("// " + str(command.lower()[2:]) + " " + str(segment) + " " + str(index) + "\n")
+        else:
+            self.output.write(template.format(index=index, prefix=self.file_prefix))
 
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command. 
@@ -0,0 +1,114 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+# The function the bootstrap code calls
+ENTRY_FUNCTION = "Sys.init"
+
+
+def split_functions(lines: list[str]) -> tuple[list[str], dict[str, list[str]]]:
+    """Splits the cleaned lines of a .vm file (see Parser.fix_input) into
+    its functions. A function runs from its "function" command up to the
+    next one.
+
+    Args:
+        lines (list[str]): the cleaned lines of a .vm file.
+
+    Returns:
+        tuple[list[str], dict[str, list[str]]]: the lines that come before
+        the first function, and the lines of every function by its name.
+    """
+    preamble = []
+    functions = {}
+    current = preamble
+    for line in lines:
+        words = line.split(" ")
+        if words[0] == "function":
+            current = []
+            functions[words[1]] = current
+        current.append(line)
+    return preamble, functions
+
+def called_functions(lines: list[str]) -> list[str]:
+    """
+    Returns:
+        list[str]: the functions that the given lines call, in order of
+        first call.
+    """
+    called = {}
+    for line in lines:
+        words = line.split(" ")
+        if words[0] == "call":
+            called[words[1]] = None
+    return list(called)
+
+def build_call_graph(
+        functions: dict[str, list[str]]) -> dict[str, list[str]]:
+    """
+    Args:
+        functions (dict[str, list[str]]): the lines of every function of the
+            program, by its name.
+
+    Returns:
+        dict[str, list[str]]: the functions that every function calls.
+    """
+    return {
+        name: called_functions(lines) for name, lines in functions.items()}
+
+def reachable_functions(
+        call_graph: dict[str, list[str]], roots: list[str]) -> set[str]:
+    """
+    Args:
+        call_graph (dict[str, list[str]]): see build_call_graph.
+        roots (list[str]): the functions that are called from outside of
+            the call graph.
+
+    Returns:
+        set[str]: the functions that can be called, directly or not, from
+        the roots. A called function that the program does not define is
+        included too, so that translating the program still fails the same
+        way it did.
+    """
+    reachable = set()
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        if name in reachable:
+            continue
+        reachable.add(name)
+        pending.extend(call_graph.get(name, []))
+    return reachable
+
+def remove_dead_functions(
+        files: list[tuple[str, list[str]]]) -> list[tuple[str, list[str]]]:
+    """Removes the functions that the program never calls. The program
+    starts at ENTRY_FUNCTION, and the code before the first function of
+    every file runs too, so both are the roots of the call graph. A program
+    without ENTRY_FUNCTION is returned as is, since where it starts is not
+    known.
+
+    Args:
+        files (list[tuple[str, list[str]]]): the (file name, cleaned lines)
+            of every .vm file of the program.
+
+    Returns:
+        list[tuple[str, list[str]]]: the files, without the dead functions.
+    """
+    split_files = [(filename, split_functions(lines))
+                   for filename, lines in files]
+    functions = {}
+    roots = [ENTRY_FUNCTION]
+    for _, (preamble, file_functions) in split_files:
+        functions.update(file_functions)
+        roots.extend(called_functions(preamble))
+    if ENTRY_FUNCTION not in functions:
+        return files
+    reachable = reachable_functions(build_call_graph(functions), roots)
+    return [
+        (filename, preamble + [
+            line for name, lines in file_functions.items()
+            if name in reachable for line in lines])
+        for filename, (preamble, file_functions) in split_files]
@@ -9,16 +9,361 @@ import typing
 
 SEGMENT_SYMBOL_DICT = {"local": "@LCL", "argument": "@ARG", "this": "@THIS", "that": "@THAT"}
 
+
+def render(*lines: str) -> str:
+    """Joins lines of assembly into a template, one line per argument"""
+    return "".join(line + "\n" for line in lines)
+
+# Every VM command is translated by formatting a single pre-rendered template
+# and writing the result at once. The templates hold the comment of the
+# command too, and are formatted with the fields:
+# {index}: the index of a push or pop.
+# {prefix}: the name of the current file, for static variables.
+# {suffix}: "<file name>_<counter>", makes the labels of a comparison unique.
+# {label}: the full name of a label, e.g. "Xxx.foo$bar".
+
+def render_comparison(command: str) -> str:
+    """The template of eq, gt or lt. Comparing the signs of the operands
+    first makes sure that subtracting them can not overflow."""
+    return render(
+        "// " + command,
+        "@SP",
+        "M=M-1",
+        "A=M",
+        "D=M",
+        "@R13",
+        "M=D",
+        "@Y_NEG_{suffix}", # jump to Y_NEG_i if y is negative
+        "D;JLT",
+        "@SP", # else check if x is negative
+        "M=M-1",
+        "A=M",
+        "D=M",
+        "@Y_POS_X_NEG_{suffix}", # jump to Y_POS_X_NEG_i if x is negative
+        "D;JLT",
+        "@R13",
+        "D=D-M",
+        "@END_{suffix}", # jump to END_i if both are positive
+        "0;JMP",
+        "(Y_NEG_{suffix})",
+        "@SP",
+        "M=M-1",
+        "A=M",
+        "D=M",
+        "@Y_NEG_X_POS_{suffix}", # jump to Y_NEG_X_POS_i if x is positive
+        "D;JGT",
+        "@R13",
+        "D=D-M",
+        "@END_{suffix}",
+        "0;JMP",
+        "(Y_POS_X_NEG_{suffix})",
+        "D=-1",
+        "@END_{suffix}",
+        "0;JMP",
+        "(Y_NEG_X_POS_{suffix})",
+        "D=1",
+        "@END_{suffix}",
+        "0;JMP",
+        "(END_{suffix})",
+        "@TRUE_{suffix}",
+        "D;J" + command.upper(),
+        "D=0",
+        "@FINALIZE_{suffix}",
+        "0;JMP",
+        "(TRUE_{suffix})",
+        "D=-1",
+        "@FINALIZE_{suffix}",
+        "0;JMP",
+        "(FINALIZE_{suffix})",
+        "@SP",
+        "A=M",
+        "M=D",
+        "@SP",
+        "M=M+1")
+
+def render_binary(command: str, operation: str) -> str:
+    """The template of an arithmetic command that pops y and replaces x with
+    the result of operation, which computes M from x in M and y in D."""
+    return render(
+        "// " + command, "@SP", "A=M-1", "D=M", "A=A-1", operation, "@SP",
+        "M=M-1")
+
+def render_unary(command: str, operation: str) -> str:
+    """The template of an arithmetic command that replaces the top of the
+    stack with the result of operation on M."""
+    return render("// " + command, "@SP", "A=M-1", operation)
+
+ARITHMETIC_TEMPLATES = {
+    "add": render("// add", "@SP", "A=M-1", "D=M", "A=A-1", "D=D+M", "M=D",
+                  "@SP", "M=M-1"),
+    "sub": render_binary("sub", "M=M-D"),
+    "neg": render_unary("neg", "M=-M"),
+    "eq": render_comparison("eq"),
+    "gt": render_comparison("gt"),
+    "lt": render_comparison("lt"),
+    "and": render_binary("and", "M=M&D"),
+    "or": render_binary("or", "M=M|D"),
+    "not": render_unary("not", "M=!M"),
+    "shiftright": render_unary("shiftright", "M=M>>"),
+    "shiftleft": render_unary("shiftleft", "M=M<<"),
+}
+
+# Pushes D
+PUSH_D = render("@SP", "A=M", "M=D", "@SP", "M=M+1")
+
+# Pops into the address held by R13 (or by another variable)
+def render_pop_to(variable: str) -> str:
+    return render(
+        variable, "M=D", "@SP", "A=M-1", "D=M", variable, "A=M", "M=D", "@SP",
+        "M=M-1")
+
+def build_push_pop_templates() -> dict[tuple[str, str], str]:
+    templates = {
+        ("C_PUSH", "constant"):
+            render("// push constant {index}", "@{index}", "D=A") + PUSH_D,
+        ("C_PUSH", "pointer"):
+            render("// push pointer {index}", "@THIS", "D=A", "@{index}",
+                   "D=D+A", "A=D", "D=M") + PUSH_D, # add 0 or 1 to @THIS
+        ("C_PUSH", "temp"):
+            render("// push temp {index}", "@5", "D=A", "@{index}", "D=D+A",
+                   "A=D", "D=M") + PUSH_D,
+        ("C_PUSH", "static"):
+            render("// push static {index}", "@{prefix}.{index}", "D=M")
+            + PUSH_D,
+        ("C_POP", "pointer"):
+            render("// pop pointer {index}", "@THIS", "D=A", "@{index}",
+                   "D=D+A") + render_pop_to("@R13"),
+        ("C_POP", "temp"):
+            render("// pop temp {index}", "@5", "D=A", "@{index}", "D=D+A")
+            + render_pop_to("@R13"),
+        ("C_POP", "static"):
+            render("// pop static {index}", "@SP", "A=M-1", "D=M",
+                   "@{prefix}.{index}", "M=D", "@SP", "M=M-1"),
+    }
+    for segment, symbol in SEGMENT_SYMBOL_DICT.items():
+        templates["C_PUSH", segment] = render(
+            "// push " + segment + " {index}", "@{index}", "D=A", symbol,
+            "A=D+M", "D=M") + PUSH_D
+        # @addr is a variable that temporarily stores the address
+        templates["C_POP", segment] = render(
+            "// pop " + segment + " {index}", "@{index}", "D=A", symbol,
+            "D=D+M") + render_pop_to("@addr")
+    return templates
+
+PUSH_POP_TEMPLATES = build_push_pop_templates()
+
+PUSH_CONSTANT_0 = PUSH_POP_TEMPLATES["C_PUSH", "constant"].format(index=0)
+
+IF_GOTO_TEMPLATE = render(
+    "// if-goto {label}", "@SP", "M=M-1", "A=M", "D=M", "@{full_label}",
+    "D;JNE")
+
+# x-y is zero only if x == y, even when it overflows
+def render_eq_if(jump: str) -> str:
+    return render(
+        "// if-goto {label}", "@SP", "M=M-1", "AM=M-1", "D=M", "A=A+1",
+        "D=D-M", "@{full_label}", "D;" + jump)
+
+def render_compare_if(
+        jump: str, y_negative: bool, y_non_negative: bool) -> str:
+    """The template of if-goto after gt or lt. When x and y have different
+    signs, x-y may overflow, but the signs alone decide the comparison.
+
+    Args:
+        jump (str): the jump on x-y.
+        y_negative (bool): whether to jump when x >= 0 > y.
+        y_non_negative (bool): whether to jump when x < 0 <= y.
+    """
+    targets = {True: "@{full_label}", False: "@NO_JUMP_{suffix}"}
+    return render(
+        "// if-goto {label}", "@SP", "M=M-1", "AM=M-1", "D=M",
+        "@X_NEG_{suffix}", "D;JLT",
+        "@SP", "A=M+1", "D=M", targets[y_negative], "D;JLT", # x >= 0
+        "@SAME_SIGN_{suffix}", "0;JMP",
+        "(X_NEG_{suffix})", "@SP", "A=M+1", "D=M", targets[y_non_negative],
+        "D;JGE", # x < 0
+        "(SAME_SIGN_{suffix})", "@SP", "A=M", "D=M", "A=A+1", "D=D-M",
+        "@{full_label}", "D;" + jump,
+        "(NO_JUMP_{suffix})")
+
+# Relation -> the template of "comparison; if-goto" that jumps if x relation y,
+# where ne, le and ge are a comparison followed by not
+COMPARE_IF_TEMPLATES = {
+    "eq": render("// eq") + render_eq_if("JEQ"),
+    "ne": render("// eq", "// not") + render_eq_if("JNE"),
+    "gt": render("// gt") + render_compare_if("JGT", True, False),
+    "le": render("// gt", "// not") + render_compare_if("JLE", False, True),
+    "lt": render("// lt") + render_compare_if("JLT", False, True),
+    "ge": render("// lt", "// not") + render_compare_if("JGE", True, False),
+}
+
+# call, up to the decrements of "ARG = SP-5-n_args" and from them on
+CALL_TEMPLATE_START = render(
+    "// call function {function} {n_args}",
+    # pushes the return address, LCL, ARG, THIS and THAT of the caller to
+    # save it
+    "@{return_address}", "D=A") + PUSH_D + "".join(
+        render("@" + pointer, "D=M") + PUSH_D
+        for pointer in ["LCL", "ARG", "THIS", "THAT"]) + render(
+    # ARG = SP-5-n_args        // repositions ARG
+    "@SP", "D=M")
+CALL_TEMPLATE_END = render(
+    "@ARG", "M=D",
+    # LCL = SP                 // repositions LCL
+    "@SP", "D=M", "@LCL", "M=D",
+    # goto function_name       // transfers control to the callee
+    "@{function}", "0;JMP",
+    # (return_address)         // injects the return address into the code
+    "({return_address})")
+
+RETURN_TEMPLATE = render(
+    "// return",
+    # frame = LCL                   // frame is a temporary variable
+    "@LCL", "D=M", "@R13", "M=D", # save frame in R13
+    "@5", "D=A", "@R13", "D=M-D", "A=D", "D=M", "@R14",
+    "M=D") + ( # save return_address in R14
+    # *ARG = pop()                  // repositions the return value for the caller
+    PUSH_POP_TEMPLATES["C_POP", "argument"].format(index=0)) + render(
+    # SP = ARG + 1                  // repositions SP for the caller
+    "@ARG", "D=M+1", "@SP", "M=D") + "".join(
+    # THAT = *(frame-1), THIS = *(frame-2), ARG = *(frame-3), LCL = *(frame-4)
+    render("@R13", "M=M-1", "A=M", "D=M", "@" + pointer, "M=D")
+    for pointer in ["THAT", "THIS", "ARG", "LCL"]) + render(
+    # goto return_address           // go to the return address
+    "@R14", "A=M", "0;JMP")
+
+# The fast calling convention pushes the frame with one SP update per value,
+# computes ARG with a single subtraction and walks LCL down the frame on
+# return. Measured on the CPU emulator, a call with n arguments to a
+# function with k > 1 locals runs 35 + (5 + 2k) + 40 instructions for the
+# call, the function entry and the return, down from 50 + n + 7k + 57. A
+# single local takes 4 instructions, and a leaf function returns in 32.
+FAST_CALL_TEMPLATE = render(
+    "// call function {function} {n_args}",
+    # pushes the return address, LCL, ARG, THIS and THAT of the caller
+    "@{return_address}", "D=A", "@SP", "A=M", "M=D") + "".join(
+        render("@" + pointer, "D=M", "@SP", "AM=M+1", "M=D")
+        for pointer in ["LCL", "ARG", "THIS", "THAT"]) + render(
+    # LCL = SP, then ARG = SP-5-n_args
+    "@SP", "MD=M+1", "@LCL", "M=D", "@{frame_size}", "D=D-A", "@ARG", "M=D",
+    "@{function}", "0;JMP",
+    "({return_address})")
+
+def render_local_initialization(n_vars: int) -> str:
+    """Pushes n_vars zeros, with a single SP update when there are more than
+    one."""
+    if n_vars == 0:
+        return ""
+    if n_vars == 1:
+        return render("@SP", "AM=M+1", "A=A-1", "M=0")
+    return render("@SP", "A=M", *["M=0", "A=A+1"] * n_vars, "D=A", "@SP",
+                  "M=D")
+
+def render_fast_return(restore: str) -> str:
+    """The template of return in the fast calling convention, which restores
+    the caller's THAT, THIS and ARG through restore, leaving LCL at
+    frame-3."""
+    return render(
+        "// return",
+        # return_address = *(frame-5), saved in R14
+        "@5", "D=A", "@LCL", "A=M-D", "D=M", "@R14", "M=D",
+        # *ARG = pop(), SP = ARG + 1
+        "@SP", "A=M-1", "D=M", "@ARG", "A=M", "M=D", "@ARG", "D=M+1", "@SP",
+        "M=D") + restore + render(
+        # LCL = *(frame-4)
+        "@LCL", "A=M-1", "D=M", "@LCL", "M=D",
+        "@R14", "A=M", "0;JMP")
+
+# THAT = *(frame-1), THIS = *(frame-2), ARG = *(frame-3), walking LCL down
+# from the frame
+FAST_RETURN_TEMPLATE = render_fast_return("".join(
+    render("@LCL", "AM=M-1", "D=M", "@" + pointer, "M=D")
+    for pointer in ["THAT", "THIS", "ARG"]))
+
+# A leaf function calls no function and never sets THIS or THAT, so they
+# still hold the caller's values, and only ARG is restored
+LEAF_RETURN_TEMPLATE = render_fast_return(render(
+    "@3", "D=A", "@LCL", "AM=M-D", "D=M", "@ARG", "M=D"))
+
+# In the size-optimized mode, comparisons, calls and returns jump to shared
+# routines, which are emitted once, right after the bootstrap code. A
+# comparison routine gets its return address in D and keeps it in R15.
+COMPARISON_CALL_TEMPLATES = {
+    command: render(
+        "// " + command, "@COMPARE_RETURN_{suffix}", "D=A",
+        "@__COMPARE_" + command.upper(), "0;JMP", "(COMPARE_RETURN_{suffix})")
+    for command in ["eq", "gt", "lt"]}
+
+def render_comparison_routine(command: str) -> str:
+    return render("(__COMPARE_" + command.upper() + ")", "@R15", "M=D") \
+        + render_comparison(command).format(
+            suffix="COMPARE_" + command.upper()) \
+        + render("@R15", "A=M", "0;JMP")
+
+# The call routine gets the return address in D, the function in R13 and
+# n_args in R14
+CALL_ROUTINE = render("(__CALL)") + PUSH_D + "".join(
+    render("@" + pointer, "D=M") + PUSH_D
+    for pointer in ["LCL", "ARG", "THIS", "THAT"]) + render(
+    # ARG = SP-5-n_args
+    "@R14", "D=M", "@SP", "D=M-D", "@5", "D=D-A", "@ARG", "M=D",
+    # LCL = SP
+    "@SP", "D=M", "@LCL", "M=D",
+    # goto function_name
+    "@R13", "A=M", "0;JMP")
+
+# n_args is set through a constant when possible, saving two instructions
+SET_N_ARGS = {0: render("@R14", "M=0"), 1: render("@R14", "M=1")}
+
+SHORT_CALL_TEMPLATE = render(
+    "// call function {function} {n_args}", "@{function}", "D=A", "@R13",
+    "M=D") + "{set_n_args}" + render(
+    "@{return_address}", "D=A", "@__CALL", "0;JMP", "({return_address})")
+
+SHORT_RETURN_TEMPLATE = render("// return", "@__RETURN", "0;JMP")
+
+# In the top-of-stack caching mode, the top of the stack may be held in D
+# instead of in RAM, and SP then only counts the values below it. These
+# compute D from the value below it, popped into M, and the top in D.
+CACHED_BINARY_OPERATIONS = {
+    "add": "D=D+M", "sub": "D=M-D", "and": "D=D&M", "or": "D=D|M"}
+CACHED_UNARY_OPERATIONS = {
+    "neg": "D=-D", "not": "D=!D", "shiftleft": "D=D<<", "shiftright": "D=D>>"}
+
+# Pops the top of the stack into D, leaving A at its address
+POP_D = render("@SP", "AM=M-1", "D=M")
+
+# Up to this index, the address of "local i" (or argument, this, that) is
+# found by incrementing A, which keeps D
+MAX_INCREMENTED_INDEX = 3
+
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    def __init__(self, output_stream: typing.TextIO,
+                 size_optimized: bool = False,
+                 cache_top: bool = False, fast_calls: bool = False) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            size_optimized (bool): emit every comparison, call and return as
+                a jump to a shared routine, instead of inlining it. The
+                routines are emitted by bootstrap.
+            cache_top (bool): keep the top of the stack in D between
+                arithmetic commands, pushes and pops, and only push it to RAM
+                before other commands, see spill.
+            fast_calls (bool): use the fast calling convention, see
+                FAST_CALL_TEMPLATE.
         """
         self.output = output_stream
+        self.size_optimized = size_optimized
+        self.cache_top = cache_top
+        self.fast_calls = fast_calls
+        # True when D holds the top of the stack
+        self.top_in_d = False
+        self.filename = ""
+        self.file_prefix = ""
         self.arithmetic_counter = 0
         self.func_counter = 0
         self.cur_func = None
@@ -31,6 +376,7 @@ class CodeWriter:
             filename (str): The name of the VM file.
         """
         self.filename = filename
+        self.file_prefix = filename.split(".")[0]
         # Your code goes here!
         # This function is useful when translating code that handles the
         # static segment. For example, in order to prevent collisions between two
@@ -43,6 +389,14 @@ class CodeWriter:
         # For example, using code similar to:
         # input_filename, input_extension = os.path.splitext(os.path.basename(input_file.name))
 
+    def spill(self) -> None:
+        """Pushes the top of the stack to RAM if it is held in D. Labels,
+        jumps, calls and function boundaries are reached from more than one
+        place, so the stack is always entirely in RAM there."""
+        if self.top_in_d:
+            self.output.write(PUSH_D)
+            self.top_in_d = False
+
     def write_arithmetic(self, command: str) -> None:
         """Writes assembly code that is the translation of the given 
         arithmetic command. For the commands eq, lt, gt, you should correctly
@@ -51,120 +405,25 @@ class CodeWriter:
         Args:
             command (str): an arithmetic command.
         """
-        self.output.write("// " + command + "\n")
-        if command == "add":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("D=D+M\n")
-            self.output.write("M=D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "sub":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("M=M-D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "neg":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=-M\n")
-
-        
-        elif command in ["eq", "gt", "lt"]:
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-            self.output.write("A=M\n")
-            self.output.write("D=M\n")
-            self.output.write("@R13\n")
-            self.output.write("M=D\n")
-            self.output.write("@Y_NEG_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter)) # jump to Y_NEG_i if y is negative
-            self.output.write("D;JLT\n")
-            self.output.write("@SP\n") # else check if x is negative
-            self.output.write("M=M-1\n")
-            self.output.write("A=M\n")
-            self.output.write("D=M\n")
-            self.output.write("@Y_POS_X_NEG_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter)) # jump to Y_POS_X_NEG_i if x is negative
-            self.output.write("D;JLT\n")
-            self.output.write("@R13\n")
-            self.output.write("D=D-M\n") 
-            self.output.write("@END_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter)) # jump to END_i if both are positive
-            self.output.write("0;JMP\n")
-            self.output.write("(Y_NEG_{filename}_{counter})\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-            self.output.write("A=M\n")
-            self.output.write("D=M\n")
-            self.output.write("@Y_NEG_X_POS_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter)) # jump to Y_NEG_X_POS_i if x is positive
-            self.output.write("D;JGT\n")
-            self.output.write("@R13\n")
-            self.output.write("D=D-M\n")
-            self.output.write("@END_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(Y_POS_X_NEG_{filename}_{counter})\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("D=-1\n")
-            self.output.write("@END_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(Y_NEG_X_POS_{filename}_{counter})\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("D=1\n")
-            self.output.write("@END_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(END_{filename}_{counter})\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("@TRUE_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("D;J{}\n".format(command.upper()))
-            self.output.write("D=0\n")
-            self.output.write("@FINALIZE_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(TRUE_{filename}_{counter})\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("D=-1\n")
-            self.output.write("@FINALIZE_{filename}_{counter}\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("0;JMP\n")
-            self.output.write("(FINALIZE_{filename}_{counter})\n".format(filename=self.filename.split(".")[0], counter=self.arithmetic_counter))
-            self.output.write("@SP\n")
-            self.output.write("A=M\n")
-            self.output.write("M=D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M+1\n") 
-
-        elif command == "and":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("M=M&D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "or":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("D=M\n")
-            self.output.write("A=A-1\n")
-            self.output.write("M=M|D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M-1\n")
-
-        elif command == "not":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=!M\n")
-
-        elif command == "shiftright":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=>>M\n")
-
-        elif command == "shiftleft":
-            self.output.write("@SP\n")
-            self.output.write("A=M-1\n")
-            self.output.write("M=<<M\n")
-        
+        if self.cache_top and command in CACHED_BINARY_OPERATIONS:
+            self.output.write("// " + command + "\n"
+                              + (POP_D if not self.top_in_d else "")
+                              + render("@SP", "AM=M-1",
+                                       CACHED_BINARY_OPERATIONS[command]))
+            self.top_in_d = True
+            return
+        if self.cache_top and command in CACHED_UNARY_OPERATIONS:
+            self.output.write("// " + command + "\n"
+                              + (POP_D if not self.top_in_d else "")
+                              + render(CACHED_UNARY_OPERATIONS[command]))
+            self.top_in_d = True
+            return
+        self.spill()
+        template = ARITHMETIC_TEMPLATES.get(command, "// " + command + "\n")
+        if self.size_optimized:
+            template = COMPARISON_CALL_TEMPLATES.get(command, template)
+        self.output.write(template.format(suffix="{}_{}".format(
+            self.file_prefix, self.arithmetic_counter)))
         self.arithmetic_counter += 1         
 
     def write_push_pop(self, command: str, segment: str, index: int) -> None:
@@ -180,121 +439,175 @@ class CodeWriter:
         # be translated to the assembly symbol "Xxx.i". In the subsequent
         # assembly process, the Hack assembler will allocate these symbolic
         # variables to the RAM, starting at address 16.
-        self.output.write("// " + str(command.lower()[2:]) + " " + str(segment) + " " + str(index) + "\n")
+        template = PUSH_POP_TEMPLATES.get((command, segment))
+        if self.cache_top and template is not None:
+            self.write_cached_push_pop(command, segment, str(index))
+            return
+        prefix = self.file_prefix
+        if segment == "static" and "." in str(index):
+            # a static variable of another file, e.g. "Xxx.3", see Inliner
+            prefix, index = str(index).split(".", 1)
+        if template is None:
+            self.output.write("// " + str(command.lower()[2:]) + " " + str(segment) + " " + str(index) + "\n")
+        else:
+            self.output.write(template.format(index=index, prefix=prefix))
+
+    def direct_address(self, segment: str, index: str) -> typing.Optional[str]:
+        """
+        Returns:
+            typing.Optional[str]: the symbol of the given entry of the static,
+            temp or pointer segment, which are at fixed addresses, or None for
+            the other segments.
+        """
+        if segment == "static" and "." in index:
+            return index # a static variable of another file, see Inliner
+        if segment == "static":
+            return "{}.{}".format(self.file_prefix, index)
+        if segment == "temp":
+            return str(5 + int(index))
+        if segment == "pointer":
+            return str(3 + int(index)) # THIS is at 3 and THAT at 4
+        return None
+
+    def address_lines(self, segment: str, index: str,
+                      keep_d: bool) -> typing.Optional[list[str]]:
+        """
+        Args:
+            segment (str): a memory segment other than constant.
+            index (str): the index in the memory segment.
+            keep_d (bool): the lines must not change D.
+
+        Returns:
+            typing.Optional[list[str]]: lines of assembly that set A to the
+            address of the given entry, or None if that can not be done
+            without changing D.
+        """
+        symbol = self.direct_address(segment, index)
+        if symbol is not None:
+            return ["@" + symbol]
+        base, index = SEGMENT_SYMBOL_DICT[segment], int(index)
+        if index == 0:
+            return [base, "A=M"]
+        if index <= MAX_INCREMENTED_INDEX:
+            return [base, "A=M+1"] + ["A=A+1"] * (index - 1)
+        if keep_d:
+            return None
+        return ["@" + str(index), "D=A", base, "A=D+M"]
+
+    def r13_address_lines(self, segment: str, index: str) -> list[str]:
+        """
+        Returns:
+            list[str]: lines of assembly that store the address of the given
+            entry of local, argument, this or that in R13.
+        """
+        return ["@" + index, "D=A", SEGMENT_SYMBOL_DICT[segment], "D=D+M",
+                "@R13", "M=D"]
+
+    def load_lines(self, segment: str, index: str) -> list[str]:
+        """
+        Returns:
+            list[str]: lines of assembly that set D to the given entry.
+        """
+        if segment == "constant":
+            return ["@" + index, "D=A"]
+        return self.address_lines(segment, index, keep_d=False) + ["D=M"]
+
+    def write_cached_push_pop(
+            self, command: str, segment: str, index: str) -> None:
+        """Writes a push or pop in the top-of-stack caching mode, see
+        write_push_pop. A push leaves the pushed value in D, and a pop
+        stores D directly."""
+        comment = "// {} {} {}\n".format(command[2:].lower(), segment, index)
         if command == "C_PUSH":
-            if segment == "constant":
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=A\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-            elif segment in SEGMENT_SYMBOL_DICT: # = {"local": "@LCL", "argument": "@ARG", "this": "@THIS", "that": "@THAT"}
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=A\n")
-                self.output.write("{}\n".format(SEGMENT_SYMBOL_DICT[segment]))
-                self.output.write("A=D+M\n")
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-            
-            elif segment == "pointer":
-                self.output.write("@THIS\n") # add 0 or 1 to @THIS
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("A=D\n")
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-            elif segment == "temp":
-                self.output.write("@5\n")
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("A=D\n")
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-            elif segment == "static":
-                self.output.write("@{Xxx}.{i}\n".format(Xxx=self.filename.split(".")[0], i=index))
-                self.output.write("D=M\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M+1\n")
-
-        elif command == "C_POP":
-            if segment in SEGMENT_SYMBOL_DICT: # = {"local": "@LCL", "argument": "@ARG", "this": "@THIS", "that": "@THAT"}
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=A\n")
-                self.output.write("{}\n".format(SEGMENT_SYMBOL_DICT[segment]))
-                self.output.write("D=D+M\n")
-                self.output.write("@addr\n") # temporary register to store the address
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@addr\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
-            
-            elif segment == "pointer":
-                self.output.write("@THIS\n") # add 0 or 1 to @THIS
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("@R13\n") # temporary register to store the address
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@R13\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
-
-            elif segment == "temp":
-                self.output.write("@5\n")
-                self.output.write("D=A\n")
-                self.output.write("@{}\n".format(index))
-                self.output.write("D=D+A\n")
-                self.output.write("@R13\n") # temporary register to store the address
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@R13\n")
-                self.output.write("A=M\n")
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
-            
-            elif segment == "static":
-                self.output.write("@SP\n")
-                self.output.write("A=M-1\n")
-                self.output.write("D=M\n")
-                self.output.write("@{Xxx}.{i}\n".format(Xxx=self.filename.split(".")[0], i=index))
-                self.output.write("M=D\n")
-                self.output.write("@SP\n")
-                self.output.write("M=M-1\n")
+            self.spill()
+            self.output.write(comment + render(*self.load_lines(
+                segment, index)))
+            self.top_in_d = True
+            return
+        if not self.top_in_d:
+            comment += POP_D
+        self.top_in_d = False
+        store = self.address_lines(segment, index, keep_d=True)
+        if store is None:
+            # the value waits in R14 while the address is computed
+            lines = ["@R14", "M=D"] + self.r13_address_lines(
+                segment, index) + ["@R14", "D=M", "@R13", "A=M", "M=D"]
+        else:
+            lines = store + ["M=D"]
+        self.output.write(comment + render(*lines))
+
+    def write_move(self, source_segment: str, source_index: str,
+                   target_segment: str, target_index: str) -> None:
+        """Writes assembly code that is the translation of "push source;
+        pop target", moving the value directly instead of through the stack.
+
+        Args:
+            source_segment (str): the memory segment to push from.
+            source_index (str): the index in source_segment.
+            target_segment (str): the memory segment to pop to.
+            target_index (str): the index in target_segment.
+        """
+        comment = render(
+            "// push {} {}".format(source_segment, source_index),
+            "// pop {} {}".format(target_segment, target_index))
+        self.spill()
+        if source_segment == "constant" and source_index in ["0", "1"]:
+            self.output.write(comment + render(*self.address_lines(
+                target_segment, target_index, keep_d=False),
+                "M=" + source_index))
+            return
+        load = self.load_lines(source_segment, source_index)
+        store = self.address_lines(target_segment, target_index, keep_d=True)
+        if store is None:
+            lines = self.r13_address_lines(target_segment, target_index) \
+                + load + ["@R13", "A=M", "M=D"]
+        else:
+            lines = load + store + ["M=D"]
+        self.output.write(comment + render(*lines))
+
+    def write_increment(self, segment: str, index: str, amount: int) -> None:
+        """Writes assembly code that is the translation of "push S i;
+        push constant c; add; pop S i" (or sub), adding to the entry in
+        place instead of through the stack.
+
+        Args:
+            segment (str): the memory segment, other than constant.
+            index (str): the index in the memory segment.
+            amount (int): the constant to add, negative for sub.
+        """
+        operation = "add" if amount >= 0 else "sub"
+        comment = render(
+            "// push {} {}".format(segment, index),
+            "// push constant {}".format(abs(amount)), "// " + operation,
+            "// pop {} {}".format(segment, index))
+        self.spill()
+        if amount == 0:
+            self.output.write(comment)
+            return
+        if abs(amount) == 1:
+            lines = self.address_lines(segment, index, keep_d=False) + [
+                "M=M+1" if amount > 0 else "M=M-1"]
+            self.output.write(comment + render(*lines))
+            return
+        update = "M=D+M" if amount > 0 else "M=M-D"
+        load = ["@" + str(abs(amount)), "D=A"]
+        address = self.address_lines(segment, index, keep_d=True)
+        if address is None:
+            lines = self.r13_address_lines(segment, index) + load + [
+                "@R13", "A=M", update]
+        else:
+            lines = load + address + [update]
+        self.output.write(comment + render(*lines))
+
+    def full_label(self, label: str) -> str:
+        """
+        Returns:
+            str: "Xxx.foo$bar" for the label bar within the function Xxx.foo,
+            or the label itself if not under a function.
+        """
+        if self.cur_func:
+            return "{Xxxfoo}${bar}".format(Xxxfoo=self.cur_func, bar=label)
+        return label
 
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command. 
@@ -307,11 +620,8 @@ class CodeWriter:
         Args:
             label (str): the label to write.
         """
-        self.output.write("// " + "label " + label + "\n") # comment for debugging
-        if self.cur_func:
-            self.output.write("({Xxxfoo}${bar})\n".format(Xxxfoo=self.cur_func, bar=label)) # writes (Xxx.foo$bar) to the output file
-        else:
-            self.output.write("({})\n".format(label)) # if not under a function, writes (label) to the output file
+        self.spill()
+        self.output.write("// label {}\n({})\n".format(label, self.full_label(label))) # comment for debugging
     
     def write_goto(self, label: str) -> None:
         """Writes assembly code that affects the goto command.
@@ -319,9 +629,8 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
-        self.output.write("// " + "goto " + label + "\n") # comment for debugging
-        self.output.write(f"@{self.cur_func}${label}\n") # if not under a function, writes @label to the output file
-        self.output.write("0;JMP\n")
+        self.spill()
+        self.output.write("// goto {bar}\n@{Xxxfoo}${bar}\n0;JMP\n".format(Xxxfoo=self.cur_func, bar=label)) # comment for debugging
     
     def write_if(self, label: str) -> None:
         """Writes assembly code that affects the if-goto command. 
@@ -329,17 +638,29 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
-        self.output.write("// " + "if-goto " + label + "\n") # comment for debugging
-        self.output.write("@SP\n")
-        self.output.write("M=M-1\n")
-        self.output.write("A=M\n")
-        self.output.write("D=M\n")
-        if self.cur_func:
-            self.output.write("@{Xxxfoo}${bar}\n".format(Xxxfoo=self.cur_func, bar=label)) # if SP<0 jump to the given label
-        else:
-            self.output.write("@{}\n".format(label)) # if not under a function, writes @label to the output file
-        self.output.write("D;JNE\n")
+        if self.top_in_d:
+            # the condition is already in D
+            self.output.write(render("// if-goto " + label, "@" + self.full_label(label), "D;JNE"))
+            self.top_in_d = False
+            return
+        self.output.write(IF_GOTO_TEMPLATE.format(label=label, full_label=self.full_label(label)))
     
+    def write_compare_if(self, relation: str, label: str) -> None:
+        """Writes assembly code that is the translation of a comparison
+        followed by if-goto, jumping on the result of the comparison instead
+        of pushing it and popping it again.
+
+        Args:
+            relation (str): jump if x relation y, one of the keys of
+                COMPARE_IF_TEMPLATES.
+            label (str): the label to go to.
+        """
+        self.spill()
+        self.output.write(COMPARE_IF_TEMPLATES[relation].format(
+            label=label, full_label=self.full_label(label),
+            suffix="{}_{}".format(self.file_prefix, self.arithmetic_counter)))
+        self.arithmetic_counter += 1
+
     def write_function(self, function_name: str, n_vars: int) -> None:
         """Writes assembly code that affects the function command. 
         The handling of each "function Xxx.foo" command within the file Xxx.vm
@@ -352,11 +673,14 @@ class CodeWriter:
             function_name (str): the name of the function.
             n_vars (int): the number of local variables of the function.
         """
-        self.output.write("// " + "function " + function_name + "\n") # comment for debugging
+        self.spill()
         self.cur_func = "{func_name}".format(func_name=function_name)
-        self.output.write("(" + self.cur_func + ")" + "\n")
-        for _ in range(int(n_vars)): # push constant 0 * n_vars
-            self.write_push_pop("C_PUSH", "constant", 0)
+        if self.fast_calls:
+            local_initialization = render_local_initialization(int(n_vars))
+        else:
+            local_initialization = PUSH_CONSTANT_0 * int(n_vars) # push constant 0 * n_vars
+        self.output.write("// function {0}\n({0})\n".format(function_name) # comment for debugging
+                          + local_initialization)
 
     
     def write_call(self, function_name: str, n_args: int) -> None:
@@ -375,90 +699,101 @@ class CodeWriter:
             function_name (str): the name of the function to call.
             n_args (int): the number of arguments of the function.
         """
+        self.spill()
         # set return_address to "Xxx.foo$ret.i"
         return_address = self.filename + "." + function_name + "$ret.{}".format(self.func_counter)
-        self.output.write("// " + "call function " + function_name + " " + str(n_args) + "\n") # comment for debugging
-        # pushes the return address, LCL, ARG, THIS and THAT of the caller to save it\            self.output.write("@{}\n".format(CALLS[i]))
-        self.output.write(f"@{return_address}\n")
-        self.output.write("D=A\n")
-        self.output.write("@SP\n")
-        self.output.write("A=M\n")
-        self.output.write("M=D\n")
-        self.output.write("@SP\n")
-        self.output.write("M=M+1\n")
-        CALLS = ["LCL", "ARG", "THIS", "THAT"]
-        for i in range(len(CALLS)):
-            self.output.write("@{}\n".format(CALLS[i]))
-            self.output.write("D=M\n")
-            self.output.write("@SP\n")
-            self.output.write("A=M\n")
-            self.output.write("M=D\n")
-            self.output.write("@SP\n")
-            self.output.write("M=M+1\n")
-        # ARG = SP-5-n_args        // repositions ARG
-        self.output.write("@SP\n")
-        self.output.write("D=M\n")
-        for _ in range(int(n_args) + 5):
-            self.output.write("D=D-1\n")
-        self.output.write("@ARG\n")
-        self.output.write("M=D\n")
-        # LCL = SP                 // repositions LCL
-        self.output.write("@SP\n")
-        self.output.write("D=M\n")
-        self.output.write("@LCL\n")
-        self.output.write("M=D\n")
-        # goto function_name       // transfers control to the callee
-        self.output.write(f"@{function_name}\n")
-        self.output.write("0;JMP\n")
-
-        # (return_address)         // injects the return address into the code
-        self.output.write("({})\n".format(return_address))
+        if self.size_optimized:
+            self.output.write(SHORT_CALL_TEMPLATE.format(
+                function=function_name, n_args=n_args,
+                return_address=return_address,
+                set_n_args=SET_N_ARGS.get(int(n_args), render(
+                    "@" + str(n_args), "D=A", "@R14", "M=D"))))
+        elif self.fast_calls:
+            self.output.write(FAST_CALL_TEMPLATE.format(
+                function=function_name, n_args=n_args,
+                return_address=return_address, frame_size=int(n_args) + 5))
+        else:
+            # ARG = SP-5-n_args, one decrement at a time
+            self.output.write(
+                CALL_TEMPLATE_START.format(function=function_name, n_args=n_args, return_address=return_address)
+                + "D=D-1\n" * (int(n_args) + 5)
+                + CALL_TEMPLATE_END.format(function=function_name, return_address=return_address))
         # increment the function counter when done
         self.func_counter += 1
     
+    def write_tail_call(self, function_name: str, n_args: int) -> None:
+        """Writes assembly code that affects "call function_name n_args"
+        followed by return. The callee takes over the frame of the current
+        function: the arguments are moved down to ARG, LCL is kept, so the
+        callee returns straight to the caller of the current function, and
+        the stack does not grow. This needs room for the arguments below the
+        saved frame, so if the current function got fewer arguments, a
+        regular call and return are written instead.
+
+        Args:
+            function_name (str): the name of the function to call.
+            n_args (int): the number of arguments of the function.
+        """
+        self.spill()
+        n_args = int(n_args)
+        lines = ["// call function {} {}".format(function_name, n_args),
+                 "// return"]
+        regular_call = "TAIL_CALL_{}_{}".format(
+            self.file_prefix, self.arithmetic_counter)
+        self.arithmetic_counter += 1
+        if n_args > 0:
+            # the current function got LCL-ARG-5 arguments
+            lines += ["@LCL", "D=M", "@ARG", "D=D-M", "@" + str(n_args + 5),
+                      "D=D-A", "@" + regular_call, "D;JLT"]
+        for i in range(n_args):
+            # argument i = the value n_args-i below SP
+            if i == n_args - 1:
+                lines += ["@SP", "A=M-1", "D=M"]
+            else:
+                lines += ["@SP", "D=M", "@" + str(n_args - i), "A=D-A", "D=M"]
+            lines += ["@ARG", "A=M"] + ["A=A+1"] * i + ["M=D"]
+        lines += ["@LCL", "D=M", "@SP", "M=D"]
+        if self.fast_calls and not self.size_optimized:
+            # The callee may be a leaf, whose return keeps THIS and THAT (see
+            # LEAF_RETURN_TEMPLATE), so they get the caller's values back here
+            lines += ["@LCL", "A=M-1", "D=M", "@THAT", "M=D",
+                      "@LCL", "A=M-1", "A=A-1", "D=M", "@THIS", "M=D"]
+        lines += ["@" + function_name, "0;JMP"]
+        self.output.write(render(*lines))
+        if n_args > 0:
+            self.output.write(render("(" + regular_call + ")"))
+            self.write_call(function_name, n_args)
+            self.write_return()
+
     def write_return(self) -> None:
         """Writes assembly code that affects the return command."""
-        self.output.write("// " + "return" + "\n") # comment for debugging
-        # frame = LCL                   // frame is a temporary variable
-        self.output.write("@LCL\n")
-        self.output.write("D=M\n")
-        self.output.write("@R13\n") # save frame in R13
-        self.output.write("M=D\n")
-        self.output.write("@5\n")
-        self.output.write("D=A\n")
-        self.output.write("@R13\n") # save frame in R13
-        self.output.write("D=M-D\n")
-        self.output.write("A=D\n")
-        self.output.write("D=M\n")
-        self.output.write("@R14\n")
-        self.output.write("M=D\n") # save return_address in R14
-        # *ARG = pop()                  // repositions the return value for the caller
-        self.write_push_pop("C_POP", "argument", 0)
-        # SP = ARG + 1                  // repositions SP for the caller
-        self.output.write("@ARG\n") 
-        self.output.write("D=M+1\n")
-        self.output.write("@SP\n")
-        self.output.write("M=D\n")
-        # THAT = *(frame-1), THIS = *(frame-2), ARG = *(frame-3), LCL = *(frame-4)
-        RESTORATION_DICT = {"THAT": "1", "THIS": "2", "ARG": "3", "LCL": "4"}
-        for key in RESTORATION_DICT:
-            self.output.write("@R13\n")
-            self.output.write("M=M-1\n")
-            self.output.write("A=M\n")
-            self.output.write("D=M\n")
-            self.output.write("@{}\n".format(key))
-            self.output.write("M=D\n") # saves D in the segment pointer
-        # goto return_address           // go to the return address
-        self.output.write("@R14\n")
-        self.output.write("A=M\n")
-        self.output.write("0;JMP\n")
+        self.spill()
+        if self.size_optimized:
+            self.output.write(SHORT_RETURN_TEMPLATE)
+        elif self.fast_calls:
+            self.output.write(FAST_RETURN_TEMPLATE)
+        else:
+            self.output.write(RETURN_TEMPLATE)
+
+    def write_leaf_return(self) -> None:
+        """Writes assembly code that affects the return command of a leaf
+        function, see LEAF_RETURN_TEMPLATE."""
+        if self.fast_calls and not self.size_optimized:
+            self.spill()
+            self.output.write(LEAF_RETURN_TEMPLATE)
+        else:
+            self.write_return()
 
     def bootstrap(self):
-        self.output.write("@256\n")
-        self.output.write("D=A\n")
-        self.output.write("@SP\n")
-        self.output.write("M=D\n")
+        self.output.write("@256\nD=A\n@SP\nM=D\n")
         self.write_call("Sys.init", 0)
+        if self.size_optimized:
+            # Sys.init never returns, so the routines are never run into
+            self.output.write(
+                "".join(render_comparison_routine(command)
+                        for command in ["eq", "gt", "lt"])
+                + CALL_ROUTINE + render("(__RETURN)")
+                + (FAST_RETURN_TEMPLATE if self.fast_calls else RETURN_TEMPLATE))
 
     def close_file(self) -> None:
         self.output.close()
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from CallGraph import split_functions
+
+# Functions of up to this many commands, not counting the function command,
+# are inlined
+DEFAULT_INLINE_BUDGET = 16
+
+BINARY_COMMANDS = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+UNARY_COMMANDS = {"neg", "not", "shiftleft", "shiftright"}
+
+
+def is_inlinable(lines: list[str], budget: int) -> bool:
+    """Checks that a function can be inlined: it fits in the budget, calls no
+    function, so it can not be recursive, and its stack is empty at every
+    label and jump and holds just the return value at every return. Code that
+    no jump reaches is not allowed, which keeps the check simple.
+
+    Args:
+        lines (list[str]): the lines of the function, see
+            CallGraph.split_functions.
+        budget (int): the largest number of commands to inline.
+
+    Returns:
+        bool: True if the function can be inlined.
+    """
+    if len(lines) - 1 > budget:
+        return False
+    depth = 0
+    reachable = True
+    for line in lines[1:]:
+        words = line.split(" ")
+        if words[0] == "label":
+            if reachable and depth != 0:
+                return False
+            depth, reachable = 0, True
+            continue
+        if not reachable:
+            return False
+        if words[0] == "push":
+            depth += 1
+        elif words[0] == "pop" or words[0] in BINARY_COMMANDS:
+            depth -= 1
+        elif words[0] == "if-goto":
+            depth -= 1
+            if depth != 0:
+                return False
+        elif words[0] == "goto":
+            if depth != 0:
+                return False
+            reachable = False
+        elif words[0] == "return":
+            if depth != 1:
+                return False
+            reachable = False
+        elif words[0] not in UNARY_COMMANDS:
+            return False
+        if depth < 0:
+            return False
+    return not reachable
+
+def inline_call(
+        lines: list[str], n_args: int, base: int, site: str,
+        static_prefix: str) -> tuple[list[str], int]:
+    """Expands a call of an inlinable function in place. The arguments and
+    the locals of the callee become locals of the caller, starting at base,
+    and THIS and THAT are saved in more of them if the callee sets them.
+
+    Args:
+        lines (list[str]): the lines of the callee.
+        n_args (int): the number of arguments of the call.
+        base (int): the first free local of the caller.
+        site (str): makes the labels of the callee unique within the caller.
+        static_prefix (str): the file of the callee if it differs from that
+            of the caller, for its static variables, or "".
+
+    Returns:
+        tuple[list[str], int]: the lines that replace the call, and the
+        number of locals they use.
+    """
+    n_locals = int(lines[0].split(" ")[2])
+    n_slots = n_args
+    for line in lines[1:]:
+        words = line.split(" ")
+        if words[0] in ["push", "pop"] and words[1] == "argument":
+            n_slots = max(n_slots, int(words[2]) + 1)
+    segments = {"argument": base, "local": base + n_slots}
+    saved = {}
+    for line in lines[1:]:
+        words = line.split(" ")
+        if words[:2] == ["pop", "pointer"] and words[2] not in saved:
+            saved[words[2]] = base + n_slots + n_locals + len(saved)
+    # differs from every renamed label, which has a $ after site
+    end = site + ".end"
+
+    expanded = ["pop local {}".format(base + i)
+                for i in reversed(range(n_args))]
+    for i in range(n_locals):
+        expanded += ["push constant 0",
+                     "pop local {}".format(segments["local"] + i)]
+    for index, slot in saved.items():
+        expanded += ["push pointer " + index, "pop local {}".format(slot)]
+    for i, line in enumerate(lines[1:], 1):
+        words = line.split(" ")
+        if words[0] in ["push", "pop"] and words[1] in segments:
+            line = "{} local {}".format(
+                words[0], segments[words[1]] + int(words[2]))
+        elif words[0] in ["push", "pop"] and words[1] == "static" \
+                and static_prefix:
+            line = "{} static {}.{}".format(words[0], static_prefix, words[2])
+        elif words[0] in ["label", "goto", "if-goto"]:
+            line = "{} {}${}".format(words[0], site, words[1])
+        elif words[0] == "return":
+            if i == len(lines) - 1:
+                continue
+            line = "goto " + end
+        expanded.append(line)
+    if any(line == "goto " + end for line in expanded):
+        expanded.append("label " + end)
+    for index, slot in saved.items():
+        expanded += ["push local {}".format(slot), "pop pointer " + index]
+    return expanded, n_slots + n_locals + len(saved)
+
+def inline_functions(
+        files: list[tuple[str, list[str]]],
+        budget: int = DEFAULT_INLINE_BUDGET) -> list[tuple[str, list[str]]]:
+    """Inlines every call of a small function, see is_inlinable. Each caller
+    gets enough extra locals for the largest call it inlines. The inlined
+    functions are kept, CallGraph.remove_dead_functions can remove those
+    that are no longer called.
+
+    Args:
+        files (list[tuple[str, list[str]]]): the (file name, cleaned lines)
+            of every .vm file of the program.
+        budget (int): the largest number of commands of an inlined function.
+
+    Returns:
+        list[tuple[str, list[str]]]: the files, with the calls inlined.
+    """
+    split_files = [(filename, split_functions(lines))
+                   for filename, lines in files]
+    inlinable = {}
+    for filename, (_, functions) in split_files:
+        for name, lines in functions.items():
+            if is_inlinable(lines, budget):
+                inlinable[name] = (filename.split(".")[0], lines)
+
+    inlined_files = []
+    for filename, (preamble, functions) in split_files:
+        prefix = filename.split(".")[0]
+        inlined_lines = list(preamble)
+        for name, lines in functions.items():
+            words = lines[0].split(" ")
+            base = int(words[2])
+            n_extra = 0
+            body = []
+            for line in lines[1:]:
+                words = line.split(" ")
+                if words[0] != "call" or words[1] not in inlinable:
+                    body.append(line)
+                    continue
+                callee_prefix, callee_lines = inlinable[words[1]]
+                expanded, n_used = inline_call(
+                    callee_lines, int(words[2]), base,
+                    "{}${}".format(words[1], len(body)),
+                    callee_prefix if callee_prefix != prefix else "")
+                body += expanded
+                n_extra = max(n_extra, n_used)
+            inlined_lines.append("function {} {}".format(name, base + n_extra))
+            inlined_lines += body
+        inlined_files.append((filename, inlined_lines))
+    return inlined_files
@@ -5,16 +5,22 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
-import sys
 import typing
-from Parser import Parser
+from Parser import Parser, fix_input
 from CodeWriter import CodeWriter
+from CallGraph import remove_dead_functions
+from VMOptimizer import optimize_commands, mark_leaf_returns
+from Inliner import DEFAULT_INLINE_BUDGET, inline_functions
 
 
 def translate_file(
         input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
+        bootstrap: bool, size_optimized: bool = False,
+        optimize: bool = False, cache_top: bool = False,
+        fast_calls: bool = False) -> None:
     """Translates a single file.
 
     Args:
@@ -22,33 +28,127 @@ def translate_file(
         output_file (typing.TextIO): writes all output to this file.
         bootstrap (bool): if this is True, the current file is the 
             first file we are translating.
+        size_optimized (bool): jump to shared routines for comparisons,
+            calls and returns, see CodeWriter.
+        optimize (bool): fold constants and fuse commands, see VMOptimizer.
+        cache_top (bool): keep the top of the stack in D, see CodeWriter.
+        fast_calls (bool): use the fast calling convention, see CodeWriter.
     """
-    parser = Parser(input_file)
-    code_writer = CodeWriter(output_file)
     filename = os.path.splitext(os.path.basename(input_file.name))[0]
+    translate_commands(
+        Parser(input_file).commands(), filename, output_file, bootstrap,
+        size_optimized, optimize, cache_top, fast_calls)
+
+def translate_commands(
+        commands: list[tuple[str, ...]], filename: str,
+        output_file: typing.TextIO, bootstrap: bool,
+        size_optimized: bool = False, optimize: bool = False,
+        cache_top: bool = False, fast_calls: bool = False) -> None:
+    """Translates the commands of a single file, see translate_file.
+
+    Args:
+        commands (list[tuple[str, ...]]): the commands of the file, see
+            Parser.commands.
+        filename (str): the name of the file, without its extension.
+        output_file (typing.TextIO): writes all output to this file.
+        bootstrap (bool): if this is True, the current file is the 
+            first file we are translating.
+        size_optimized (bool): jump to shared routines for comparisons,
+            calls and returns, see CodeWriter.
+        optimize (bool): fold constants and fuse commands, see VMOptimizer.
+        cache_top (bool): keep the top of the stack in D, see CodeWriter.
+        fast_calls (bool): use the fast calling convention, see CodeWriter.
+    """
+    code_writer = CodeWriter(
+        output_file, size_optimized, cache_top, fast_calls)
     code_writer.set_file_name(filename)
 
     if bootstrap:
         code_writer.bootstrap()
 
-    while parser.has_more_commands():
-        if parser.command_type() == "C_ARITHMETIC":
-            code_writer.write_arithmetic(parser.arg1())
-        elif parser.command_type() == "C_PUSH" or parser.command_type() == "C_POP": 
-            code_writer.write_push_pop(parser.command_type(), parser.arg1(), parser.arg2())
-        elif parser.command_type() == "C_LABEL":
-            code_writer.write_label(parser.arg1())
-        elif parser.command_type() == "C_GOTO":
-            code_writer.write_goto(parser.arg1())
-        elif parser.command_type() == "C_IF":
-            code_writer.write_if(parser.arg1())
-        elif parser.command_type() == "C_FUNCTION":
-            code_writer.write_function(parser.arg1(), parser.arg2())
-        elif parser.command_type() == "C_CALL":
-            code_writer.write_call(parser.arg1(), parser.arg2())
-        elif parser.command_type() == "C_RETURN":
+    if optimize:
+        commands = optimize_commands(commands)
+    if fast_calls:
+        commands = mark_leaf_returns(commands)
+
+    for command in commands:
+        command_type = command[0]
+        if command_type == "C_ARITHMETIC":
+            code_writer.write_arithmetic(command[1])
+        elif command_type == "C_PUSH" or command_type == "C_POP": 
+            code_writer.write_push_pop(*command)
+        elif command_type == "C_LABEL":
+            code_writer.write_label(command[1])
+        elif command_type == "C_GOTO":
+            code_writer.write_goto(command[1])
+        elif command_type == "C_IF":
+            code_writer.write_if(command[1])
+        elif command_type == "C_FUNCTION":
+            code_writer.write_function(command[1], command[2])
+        elif command_type == "C_CALL":
+            code_writer.write_call(command[1], command[2])
+        elif command_type == "C_RETURN":
             code_writer.write_return()
-        parser.advance()
+        elif command_type == "C_LEAF_RETURN":
+            code_writer.write_leaf_return()
+        elif command_type == "C_MOVE":
+            code_writer.write_move(*command[1:])
+        elif command_type == "C_INCREMENT":
+            code_writer.write_increment(*command[1:])
+        elif command_type == "C_COMPARE_IF":
+            code_writer.write_compare_if(*command[1:])
+        elif command_type == "C_TAIL_CALL":
+            code_writer.write_tail_call(*command[1:])
+    # the next file gets a code writer of its own
+    code_writer.spill()
+
+def translate_program(
+        input_paths: list[str], output_file: typing.TextIO,
+        size_optimized: bool = False, whole_program: bool = False,
+        optimize: bool = False, cache_top: bool = False,
+        fast_calls: bool = False,
+        inline_budget: typing.Optional[int] = None) -> None:
+    """Translates the .vm files of a program into a single output file.
+
+    Args:
+        input_paths (list[str]): the paths of the .vm files, the first one
+            gets the bootstrap code.
+        output_file (typing.TextIO): writes all output to this file.
+        size_optimized (bool): jump to shared routines for comparisons,
+            calls and returns, see CodeWriter.
+        whole_program (bool): read all the files first, and only translate
+            the functions that can be called from Sys.init, see CallGraph.
+        optimize (bool): fold constants and fuse commands, see VMOptimizer.
+        cache_top (bool): keep the top of the stack in D, see CodeWriter.
+        fast_calls (bool): use the fast calling convention, see CodeWriter.
+        inline_budget (typing.Optional[int]): if given, inline the functions
+            of up to this many commands, see Inliner. This reads all the
+            files first, as whole_program does.
+    """
+    if not whole_program and inline_budget is None:
+        bootstrap = True
+        for input_path in input_paths:
+            with open(input_path, 'r') as input_file:
+                translate_file(
+                    input_file, output_file, bootstrap, size_optimized,
+                    optimize, cache_top, fast_calls)
+            bootstrap = False
+        return
+
+    files = []
+    for input_path in input_paths:
+        with open(input_path, 'r') as input_file:
+            files.append((
+                os.path.splitext(os.path.basename(input_path))[0],
+                fix_input(input_file.read().splitlines())))
+    if inline_budget is not None:
+        files = inline_functions(files, inline_budget)
+    files = remove_dead_functions(files)
+    for i, (filename, lines) in enumerate(files):
+        commands = Parser(io.StringIO("\n".join(lines))).commands()
+        translate_commands(
+            commands, filename, output_file, i == 0, size_optimized, optimize,
+            cache_top, fast_calls)
 
 if "__main__" == __name__:
     # Parses the input path and calls translate_file on each input file.
@@ -57,9 +157,42 @@ if "__main__" == __name__:
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
     # sys.argv = ["VMtranslator", "/Users/asaffeldman/Desktop/nand2tetris/projects/08/FunctionCalls/FibonacciElement/FibonacciElement.vm"]
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="VMtranslator", description="Translates VM code to Hack assembly.")
+    arg_parser.add_argument("path", help="a .vm file or a directory")
+    arg_parser.add_argument(
+        "--size", action="store_true",
+        help="optimize for size: comparisons, calls and returns jump to "
+             "shared routines instead of being inlined")
+    arg_parser.add_argument(
+        "--whole-program", action="store_true",
+        help="read all the files first, and leave out the functions that "
+             "can not be called from Sys.init")
+    arg_parser.add_argument(
+        "--optimize", action="store_true",
+        help="fold constant arithmetic, and translate common sequences of "
+             "commands as single moves, increments, compare-and-branches "
+             "and tail calls")
+    arg_parser.add_argument(
+        "--cache-top", action="store_true",
+        help="keep the top of the stack in the D register between "
+             "arithmetic commands, pushes and pops")
+    arg_parser.add_argument(
+        "--fast-calls", action="store_true",
+        help="use a faster calling convention for calls, function entries "
+             "and returns")
+    arg_parser.add_argument(
+        "--inline", action="store_true",
+        help="inline small functions that call no function, and leave out "
+             "the functions that are no longer called, as --whole-program "
+             "does")
+    arg_parser.add_argument(
+        "--inline-budget", type=int, default=DEFAULT_INLINE_BUDGET,
+        metavar="N",
+        help="inline functions of up to N commands (default: {})".format(
+            DEFAULT_INLINE_BUDGET))
+    args = arg_parser.parse_args()
+    argument_path = os.path.abspath(args.path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -70,12 +203,11 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
-    bootstrap = True
+    files_to_translate = [
+        input_path for input_path in files_to_translate
+        if os.path.splitext(input_path)[1].lower() == ".vm"]
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+        translate_program(
+            files_to_translate, output_file, args.size, args.whole_program,
+            args.optimize, args.cache_top, args.fast_calls,
+            args.inline_budget if args.inline else None)
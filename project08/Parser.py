@@ -147,4 +147,25 @@ class Parser:
             "C_FUNCTION" or "C_CALL".
         """
         if self.command_type() in ["C_PUSH", "C_POP", "C_FUNCTION", "C_CALL"]:
-            return self.input_lines[self.index].split(" ")[2]
\ No newline at end of file
+            return self.input_lines[self.index].split(" ")[2]
+
+    def commands(self) -> list[tuple[str, ...]]:
+        """Parses the rest of the input at once.
+
+        Returns:
+            list[tuple[str, ...]]: a (command type, arguments...) tuple for
+            every command, where the arguments are those that arg1 and arg2
+            return for the command, e.g. ("C_PUSH", "local", "2"),
+            ("C_ARITHMETIC", "add") or ("C_RETURN",).
+        """
+        commands = []
+        while self.has_more_commands():
+            command_type = self.command_type()
+            if command_type == "C_RETURN":
+                commands.append((command_type,))
+            elif command_type in ["C_PUSH", "C_POP", "C_FUNCTION", "C_CALL"]:
+                commands.append((command_type, self.arg1(), self.arg2()))
+            else:
+                commands.append((command_type, self.arg1()))
+            self.advance()
+        return commands
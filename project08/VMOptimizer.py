@@ -0,0 +1,223 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# The largest constant that "push constant" can push
+MAX_CONSTANT = 32767
+
+# Every operation works on, and gives, a signed 16-bit value
+BINARY_FOLDS = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "eq": lambda x, y: -(x == y),
+    "gt": lambda x, y: -(x > y),
+    "lt": lambda x, y: -(x < y),
+}
+UNARY_FOLDS = {
+    "neg": lambda x: -x,
+    "not": lambda x: ~x,
+    "shiftleft": lambda x: x << 1,
+    "shiftright": lambda x: x >> 1,  # the sign bit is kept
+}
+
+# (comparison, followed by not) -> the relation that "comparison; if-goto"
+# jumps on, see CodeWriter.write_compare_if
+COMPARE_IF_RELATIONS = {
+    ("eq", False): "eq", ("eq", True): "ne",
+    ("gt", False): "gt", ("gt", True): "le",
+    ("lt", False): "lt", ("lt", True): "ge",
+}
+
+# The segments that a fused command may read or write, constant can only
+# be read
+MEMORY_SEGMENTS = {
+    "local", "argument", "this", "that", "static", "temp", "pointer"}
+
+
+def to_word(value: int) -> int:
+    """
+    Returns:
+        int: value wrapped to a signed 16-bit value, as the Hack ALU does.
+    """
+    return (value + 0x8000) % 0x10000 - 0x8000
+
+def constant_commands(value: int) -> list[tuple[str, ...]]:
+    """
+    Args:
+        value (int): a signed 16-bit value.
+
+    Returns:
+        list[tuple[str, ...]]: the shortest commands that push the value.
+    """
+    if value >= 0:
+        return [("C_PUSH", "constant", str(value))]
+    if -value <= MAX_CONSTANT:
+        return [("C_PUSH", "constant", str(-value)), ("C_ARITHMETIC", "neg")]
+    return [("C_PUSH", "constant", str(~value)), ("C_ARITHMETIC", "not")]
+
+def trailing_constant(
+        commands: list[tuple[str, ...]],
+        end: int) -> typing.Optional[tuple[int, int]]:
+    """Finds a constant pushed by the commands that end at the given
+    position, as written by constant_commands.
+
+    Returns:
+        typing.Optional[tuple[int, int]]: the value and the number of
+        commands that push it, or None if they do not push a constant.
+    """
+    if end >= 1 and commands[end - 1][:2] == ("C_PUSH", "constant"):
+        return to_word(int(commands[end - 1][2])), 1
+    if end >= 2 and commands[end - 2][:2] == ("C_PUSH", "constant") \
+            and commands[end - 1] in [
+                ("C_ARITHMETIC", "neg"), ("C_ARITHMETIC", "not")]:
+        value = UNARY_FOLDS[commands[end - 1][1]](int(commands[end - 2][2]))
+        return to_word(value), 2
+    return None
+
+def fold_constants(
+        commands: list[tuple[str, ...]]) -> list[tuple[str, ...]]:
+    """Computes arithmetic on constants at translation time, e.g.
+    "push constant 2; push constant 3; add" becomes "push constant 5".
+    Folded results are folded again, so that whole constant expressions
+    become a single constant, and an if-goto that never jumps is removed.
+    Only consecutive commands are folded, so a label in between keeps its
+    commands apart.
+
+    Args:
+        commands (list[tuple[str, ...]]): the commands, see Parser.commands.
+
+    Returns:
+        list[tuple[str, ...]]: the folded commands.
+    """
+    folded = []
+    for command in commands:
+        if command[0] == "C_ARITHMETIC" and command[1] in BINARY_FOLDS:
+            y = trailing_constant(folded, len(folded))
+            x = y and trailing_constant(folded, len(folded) - y[1])
+            if x:
+                del folded[len(folded) - x[1] - y[1]:]
+                folded.extend(constant_commands(to_word(
+                    BINARY_FOLDS[command[1]](x[0], y[0]))))
+                continue
+        elif command[0] == "C_ARITHMETIC" and command[1] in UNARY_FOLDS:
+            x = trailing_constant(folded, len(folded))
+            if x:
+                del folded[len(folded) - x[1]:]
+                folded.extend(constant_commands(to_word(
+                    UNARY_FOLDS[command[1]](x[0]))))
+                continue
+        elif command[0] == "C_IF":
+            # e.g. the condition of "while (true)", negated by the compiler
+            x = trailing_constant(folded, len(folded))
+            if x and x[0] == 0:
+                del folded[len(folded) - x[1]:]
+                continue
+        folded.append(command)
+    return folded
+
+def fuse_commands(
+        commands: list[tuple[str, ...]]) -> list[tuple[str, ...]]:
+    """Replaces common sequences of commands with superinstructions, which
+    CodeWriter translates without going through the stack:
+    - "push S i; push constant c; add; pop S i" (or sub) becomes
+      ("C_INCREMENT", S, i, c) (or -c).
+    - "push S1 i1; pop S2 i2" becomes ("C_MOVE", S1, i1, S2, i2).
+    - "eq; if-goto L" (or gt, lt), optionally with not in between, becomes
+      ("C_COMPARE_IF", relation, L), see COMPARE_IF_RELATIONS.
+    - "call f n; return" becomes ("C_TAIL_CALL", f, n).
+
+    Args:
+        commands (list[tuple[str, ...]]): the commands, see Parser.commands.
+
+    Returns:
+        list[tuple[str, ...]]: the fused commands.
+    """
+    fused = []
+    i = 0
+    while i < len(commands):
+        command = commands[i]
+        if command[0] == "C_PUSH" and i + 1 < len(commands):
+            next_command = commands[i + 1]
+            if command[1] in MEMORY_SEGMENTS and i + 3 < len(commands) \
+                    and next_command[:2] == ("C_PUSH", "constant") \
+                    and commands[i + 2] in [
+                        ("C_ARITHMETIC", "add"), ("C_ARITHMETIC", "sub")] \
+                    and commands[i + 3] == ("C_POP",) + command[1:]:
+                amount = int(next_command[2])
+                if commands[i + 2][1] == "sub":
+                    amount = -amount
+                fused.append(("C_INCREMENT", command[1], command[2], amount))
+                i += 4
+                continue
+            if next_command[0] == "C_POP" \
+                    and next_command[1] in MEMORY_SEGMENTS:
+                fused.append(("C_MOVE",) + command[1:] + next_command[1:])
+                i += 2
+                continue
+        if command[0] == "C_ARITHMETIC" and command[1] in ["eq", "gt", "lt"]:
+            negated = i + 1 < len(commands) \
+                and commands[i + 1] == ("C_ARITHMETIC", "not")
+            end = i + 1 + negated
+            if end < len(commands) and commands[end][0] == "C_IF":
+                fused.append(("C_COMPARE_IF", COMPARE_IF_RELATIONS[
+                    command[1], negated], commands[end][1]))
+                i = end + 1
+                continue
+        if command[0] == "C_CALL" and i + 1 < len(commands) \
+                and commands[i + 1] == ("C_RETURN",):
+            fused.append(("C_TAIL_CALL",) + command[1:])
+            i += 2
+            continue
+        fused.append(command)
+        i += 1
+    return fused
+
+def writes_pointer(command: tuple[str, ...]) -> bool:
+    """
+    Returns:
+        bool: whether the command may set THIS or THAT.
+    """
+    return command[:2] == ("C_POP", "pointer") \
+        or command[0] == "C_MOVE" and command[3] == "pointer" \
+        or command[:2] == ("C_INCREMENT", "pointer")
+
+def mark_leaf_returns(
+        commands: list[tuple[str, ...]]) -> list[tuple[str, ...]]:
+    """Replaces the returns of leaf functions, which call no function and
+    never set THIS or THAT, with ("C_LEAF_RETURN",), see
+    CodeWriter.write_leaf_return. A function runs from its "function"
+    command up to the next one.
+
+    Args:
+        commands (list[tuple[str, ...]]): the commands, see Parser.commands.
+
+    Returns:
+        list[tuple[str, ...]]: the marked commands.
+    """
+    marked = list(commands)
+    start = None
+    for i, command in enumerate(commands + [("C_FUNCTION",)]):
+        if command[0] != "C_FUNCTION":
+            continue
+        if start is not None and not any(
+                body_command[0] in ["C_CALL", "C_TAIL_CALL"]
+                or writes_pointer(body_command)
+                for body_command in commands[start:i]):
+            for j in range(start, i):
+                if commands[j] == ("C_RETURN",):
+                    marked[j] = ("C_LEAF_RETURN",)
+        start = i
+    return marked
+
+def optimize_commands(
+        commands: list[tuple[str, ...]]) -> list[tuple[str, ...]]:
+    """Folds constants, then fuses the folded commands, see fold_constants
+    and fuse_commands."""
+    return fuse_commands(fold_constants(commands))
@@ -0,0 +1,70 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import os
+import socket
+import sys
+
+# The exit status when no server is running, the wrappers then run the
+# script directly (EX_TEMPFAIL from sysexits.h)
+NO_SERVER_STATUS = 75
+
+
+def socket_path() -> str:
+    """
+    Returns:
+        str: the path of the Unix socket the server listens on, which is
+        $HACK_TOOLCHAIN_SOCKET if it is set.
+    """
+    if "HACK_TOOLCHAIN_SOCKET" in os.environ:
+        return os.environ["HACK_TOOLCHAIN_SOCKET"]
+    directory = os.environ.get("XDG_RUNTIME_DIR", "/tmp")
+    return os.path.join(
+        directory, "hack-toolchain-{}.sock".format(os.getuid()))
+
+
+def run_remote(script: str, argv: list[str]) -> int:
+    """Asks the server to run a script, and writes its output.
+
+    Args:
+        script (str): the path of the script, e.g. project06/Main.py.
+        argv (list[str]): the arguments of the script.
+
+    Returns:
+        int: the exit status of the script, or NO_SERVER_STATUS if no server
+        is running.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path())
+    except OSError:
+        connection.close()
+        return NO_SERVER_STATUS
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps({
+            "script": os.path.abspath(script),
+            "argv": argv,
+            "cwd": os.getcwd(),
+        }).encode() + b"\n")
+        stream.flush()
+        response = stream.readline()
+    if not response:
+        # The server went away in the middle of the request
+        return NO_SERVER_STATUS
+    response = json.loads(response)
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["status"]
+
+
+if "__main__" == __name__:
+    # Runs the script given as the first argument on the toolchain server,
+    # passing it the rest of the arguments.
+    if len(sys.argv) < 2:
+        sys.exit("Invalid usage, please use: ToolchainClient <script> [args]")
+    sys.exit(run_remote(sys.argv[1], sys.argv[2:]))
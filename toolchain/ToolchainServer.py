@@ -0,0 +1,180 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import builtins
+import contextlib
+import io
+import json
+import os
+import socketserver
+import sys
+import traceback
+import types
+from ToolchainClient import socket_path
+
+# Only scripts inside this repository are run
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ToolEnvironment:
+    """The modules of one project directory, kept loaded between requests.
+    Several projects have modules with the same name (Parser, SymbolTable,
+    ...), so the modules of a project are only installed in sys.modules
+    while one of its scripts runs.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Args:
+            directory (str): the project directory.
+        """
+        self.directory = directory
+        self.modules = {}
+        self.scripts = {}
+        self.mtimes = self.source_mtimes()
+
+    def source_mtimes(self) -> dict[str, float]:
+        return {
+            entry.name: entry.stat().st_mtime
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".py")}
+
+    def owns(self, module: types.ModuleType) -> bool:
+        module_file = getattr(module, "__file__", None)
+        return module_file is not None \
+            and os.path.dirname(os.path.abspath(module_file)) == self.directory
+
+    def run(self, script: str, argv: list[str],
+            cwd: str) -> tuple[int, str, str]:
+        """Runs a script of the project the same way "python3 script argv"
+        would, from the given working directory.
+
+        Args:
+            script (str): the absolute path of the script.
+            argv (list[str]): the arguments of the script.
+            cwd (str): the working directory of the client.
+
+        Returns:
+            tuple[int, str, str]: the exit status, stdout and stderr.
+        """
+        # Reload everything once any source of the project changed, so the
+        # results always match a direct run
+        mtimes = self.source_mtimes()
+        if mtimes != self.mtimes:
+            self.modules = {}
+            self.scripts = {}
+            self.mtimes = mtimes
+        if script not in self.scripts:
+            with open(script, 'r') as script_file:
+                self.scripts[script] = compile(
+                    script_file.read(), script, "exec")
+
+        main_module = types.ModuleType("__main__")
+        main_module.__file__ = script
+        main_module.__builtins__ = builtins
+        saved_main = sys.modules["__main__"]
+        saved_argv = sys.argv
+        saved_path = sys.path[:]
+        saved_cwd = os.getcwd()
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        status = 0
+        sys.modules.update(self.modules)
+        sys.modules["__main__"] = main_module
+        sys.argv = [script] + argv
+        sys.path.insert(0, self.directory)
+        try:
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(stdout), \
+                    contextlib.redirect_stderr(stderr):
+                try:
+                    exec(self.scripts[script], main_module.__dict__)
+                except SystemExit as exit:
+                    if exit.code is None:
+                        status = 0
+                    elif isinstance(exit.code, int):
+                        status = exit.code
+                    else:
+                        print(exit.code, file=sys.stderr)
+                        status = 1
+                except Exception as error:
+                    # Skips the frame of this method, so the traceback is
+                    # the same as that of a direct run
+                    traceback.print_exception(
+                        type(error), error, error.__traceback__.tb_next)
+                    status = 1
+        finally:
+            os.chdir(saved_cwd)
+            sys.argv = saved_argv
+            sys.path[:] = saved_path
+            sys.modules["__main__"] = saved_main
+            for name, module in list(sys.modules.items()):
+                if self.owns(module):
+                    self.modules[name] = module
+                    del sys.modules[name]
+        return status, stdout.getvalue(), stderr.getvalue()
+
+
+class ToolchainHandler(socketserver.StreamRequestHandler):
+    """Serves a single request: one JSON line with the script, its arguments
+    and the working directory, answered by one JSON line with the exit
+    status, stdout and stderr of the run.
+    """
+
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline())
+        script = os.path.abspath(request["script"])
+        if os.path.commonpath([script, REPOSITORY_ROOT]) != REPOSITORY_ROOT \
+                or not os.path.isfile(script):
+            status, stdout, stderr = 2, "", "Unknown script: " + script + "\n"
+        else:
+            directory = os.path.dirname(script)
+            environments = self.server.environments
+            if directory not in environments:
+                environments[directory] = ToolEnvironment(directory)
+            status, stdout, stderr = environments[directory].run(
+                script, request["argv"], request["cwd"])
+        self.wfile.write(json.dumps(
+            {"status": status, "stdout": stdout, "stderr": stderr}).encode()
+            + b"\n")
+
+
+class ToolchainServer(socketserver.UnixStreamServer):
+    """A local server that keeps the modules of the assembler, VM translator
+    and Jack compiler loaded, and runs their scripts on behalf of
+    ToolchainClient. Requests are served one at a time, since running a
+    script changes process-wide state such as sys.modules and the working
+    directory.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): the path of the Unix socket to listen on.
+        """
+        self.environments = {}
+        if os.path.exists(path):
+            os.remove(path)
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(path, ToolchainHandler)
+        finally:
+            os.umask(old_umask)
+
+
+if "__main__" == __name__:
+    # Serves requests until interrupted.
+    if len(sys.argv) > 2:
+        sys.exit("Invalid usage, please use: ToolchainServer [socket path]")
+    path = sys.argv[1] if len(sys.argv) == 2 else socket_path()
+    with ToolchainServer(path) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)